@@ -0,0 +1,44 @@
+-- Add PRSERV indexes to the BLU staging tables
+-- batchDocument pages Prime_Staging by PRSERV (keyset pagination) and joins it
+-- to Document on PRSERV; batchParty joins Multi_Staging/Prime_Staging on PRSERV.
+-- Without these indexes each batch scans and sorts the whole staging table.
+
+SET @prime_index_exists = (
+    SELECT COUNT(1)
+    FROM INFORMATION_SCHEMA.STATISTICS
+    WHERE table_schema = DATABASE()
+    AND table_name = 'Prime_Staging'
+    AND index_name = 'idx_prime_staging_prserv'
+);
+
+SET @create_prime_index_sql = IF(
+    @prime_index_exists = 0,
+    'CREATE INDEX idx_prime_staging_prserv ON Prime_Staging(PRSERV)',
+    'SELECT "idx_prime_staging_prserv already exists" AS message'
+);
+
+PREPARE stmt FROM @create_prime_index_sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @multi_index_exists = (
+    SELECT COUNT(1)
+    FROM INFORMATION_SCHEMA.STATISTICS
+    WHERE table_schema = DATABASE()
+    AND table_name = 'Multi_Staging'
+    AND index_name = 'idx_multi_staging_prserv'
+);
+
+SET @create_multi_index_sql = IF(
+    @multi_index_exists = 0,
+    'CREATE INDEX idx_multi_staging_prserv ON Multi_Staging(PRSERV)',
+    'SELECT "idx_multi_staging_prserv already exists" AS message'
+);
+
+PREPARE stmt FROM @create_multi_index_sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Rollback:
+--   DROP INDEX idx_prime_staging_prserv ON Prime_Staging;
+--   DROP INDEX idx_multi_staging_prserv ON Multi_Staging;
@@ -0,0 +1,12 @@
+-- Checkpoint table for resumable python/ ETL jobs
+-- Each job (e.g. 'batchDocument:<countyID>') stores the last key it committed,
+-- written in the same transaction as the batch it describes.
+
+CREATE TABLE IF NOT EXISTS ETL_Checkpoint (
+  job VARCHAR(191) PRIMARY KEY,
+  last_key VARCHAR(255) NULL,
+  updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Rollback:
+--   DROP TABLE ETL_Checkpoint;
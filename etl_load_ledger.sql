@@ -0,0 +1,22 @@
+-- Load ledger for python/loadFilesToDB.py
+-- One row per (staging table, file content hash). A file is skipped on rerun
+-- once its row has status 'loaded'; the row is written in the same
+-- transaction as the LOAD DATA it describes.
+
+CREATE TABLE IF NOT EXISTS ETL_Load_Ledger (
+  ledgerID INT PRIMARY KEY AUTO_INCREMENT,
+  tableName VARCHAR(64) NOT NULL,
+  filePath VARCHAR(1024) NOT NULL,
+  fileSize BIGINT NOT NULL,
+  fileHash CHAR(64) NOT NULL,
+  rowsLoaded BIGINT NULL,
+  warnings INT NULL,
+  status ENUM('loaded', 'failed') NOT NULL,
+  error TEXT NULL,
+  loadedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+  UNIQUE INDEX uniq_ledger_table_hash (tableName, fileHash)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Rollback:
+--   DROP TABLE ETL_Load_Ledger;
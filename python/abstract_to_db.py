@@ -1,10 +1,13 @@
 import pymysql
 import re
 import os
+import sys
+import time
+from db_pool import ConnectionPool
 
 BASE_DIR = r''  # Set your base directory here
 file_name = ''            # Your data file name
-file_path = os.path.join(BASE_DIR, file_name)
+file_path = ''            # Full path instead; '' = BASE_DIR/file_name (resolved in main())
 
 DB_CONFIG = {
     'host': '',
@@ -15,6 +18,19 @@ DB_CONFIG = {
 
 COUNTY_NAME = ""
 
+# The export is parsed READ_CHARS at a time; rows go out in batches of at most
+# BATCH_SIZE rows / BATCH_BYTES of name data, committed every COMMIT_INTERVAL rows
+READ_CHARS = 4 * 1024 * 1024
+BATCH_SIZE = 1000
+BATCH_BYTES = 512 * 1024
+COMMIT_INTERVAL = 10000
+
+INSERT_ABSTRACT_SQL = "INSERT IGNORE INTO Abstract (abstractCode, name, countyID) VALUES (%s, %s, %s)"
+ABSTRACT_PATTERN = re.compile(r'(\d+)([^\d]+)')
+LAST_NUMBER_PATTERN = re.compile(r'\d+(?=\D*\Z)')
+
+db_pool = ConnectionPool(DB_CONFIG, size=1)
+
 def get_county_id(cursor, name):
     cursor.execute("SELECT countyID FROM County WHERE name = %s LIMIT 1", (name,))
     result = cursor.fetchone()
@@ -24,17 +40,64 @@ def get_county_id(cursor, name):
         return None
 
 def parse_abstract_data(raw, county_id):
-    pattern = re.compile(r'(\d+)([^\d]+)')
-    matches = pattern.findall(raw)
-    result = []
-    for m in matches:
-        id_ = int(m[0])
-        names = m[1].split('{EOR}')
-        for name in names:
+    """Yields (abstractCode, name, countyID) for each name in raw."""
+    for m in ABSTRACT_PATTERN.finditer(raw):
+        id_ = int(m.group(1))
+        for name in m.group(2).split('{EOR}'):
             name = name.strip()
             if name:
-                result.append((id_, name, county_id))
-    return result
+                yield (id_, name, county_id)
+
+def last_number_start(text):
+    """Index where the last run of digits in text starts, or None."""
+    end = max(text.rfind(d) for d in '0123456789')
+    # Only the text after the last ASCII digit needs the (slower) \d scan
+    m = LAST_NUMBER_PATTERN.search(text, end + 1)
+    if m:
+        end = m.start()
+    elif end < 0:
+        return None
+    while end > 0 and text[end - 1].isdecimal():
+        end -= 1
+    return end
+
+def iter_abstract_file(path, county_id, read_chars=READ_CHARS):
+    """
+    Streams parse_abstract_data over path READ_CHARS at a time.
+
+    Text up to the start of the last number in the buffer always holds
+    complete matches, so it is parsed and the rest is carried into the next
+    read; the result is the same as parsing the whole file at once.
+    """
+    carry = ''
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            chunk = f.read(read_chars)
+            if not chunk:
+                break
+            text = carry + chunk
+            cut = last_number_start(text)
+            if cut is None:
+                # No number yet: nothing here can belong to a match
+                carry = ''
+                continue
+            yield from parse_abstract_data(text[:cut], county_id)
+            carry = text[cut:]
+    yield from parse_abstract_data(carry, county_id)
+
+def iter_size_bounded_batches(records, max_rows=BATCH_SIZE, max_bytes=BATCH_BYTES):
+    """Groups records into lists bounded by row count and by name bytes."""
+    batch = []
+    size = 0
+    for record in records:
+        batch.append(record)
+        size += len(record[1]) + 16
+        if len(batch) >= max_rows or size >= max_bytes:
+            yield batch
+            batch = []
+            size = 0
+    if batch:
+        yield batch
 
 # def parse_abstract_data(raw, county_id):
 #     # Match: number,"Name"
@@ -50,48 +113,51 @@ def parse_abstract_data(raw, county_id):
 #     return result
 
 def insert_abstract_records(records):
-    conn = pymysql.connect(**DB_CONFIG)
-    cursor = conn.cursor()
-
-    insert_sql = "INSERT IGNORE INTO Abstract (abstractCode, name, countyID) VALUES (%s, %s, %s)"
+    """
+    Inserts records (any iterable) in size-bounded batches, committing every
+    COMMIT_INTERVAL rows. Returns (parsed, inserted); on error, rows from
+    earlier commits stay in place and the error is re-raised.
+    """
+    parsed = 0
+    inserted = 0
+    since_commit = 0
+    start = time.perf_counter()
 
     try:
-        cursor.executemany(insert_sql, records)
-        conn.commit()
-        print(f"Inserted {cursor.rowcount} rows into Abstract table.")
+        with db_pool.connection() as conn, conn.cursor() as cursor:
+            for batch in iter_size_bounded_batches(records, BATCH_SIZE, BATCH_BYTES):
+                cursor.executemany(INSERT_ABSTRACT_SQL, batch)
+                parsed += len(batch)
+                inserted += cursor.rowcount
+                since_commit += len(batch)
+                if since_commit >= COMMIT_INTERVAL:
+                    conn.commit()
+                    since_commit = 0
+            conn.commit()
     except pymysql.MySQLError as e:
-        print(f"Database error: {e}")
-        conn.rollback()
+        print(f"Database error after {parsed} rows: {e}")
+        raise
     except Exception as e:
-        print(f"Unexpected error: {e}")
-        conn.rollback()
-    finally:
-        cursor.close()
-        conn.close()
+        print(f"Unexpected error after {parsed} rows: {e}")
+        raise
 
-def main():
-    with open(file_path, 'r', encoding='utf-8') as f:
-        raw_data = f.read()
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(f"Inserted {inserted} of {parsed} rows into Abstract table in {elapsed:.1f}s ({parsed / elapsed:,.0f} rows/s).")
+    return parsed, inserted
 
-    conn = pymysql.connect(**DB_CONFIG)
-    cursor = conn.cursor()
+def main():
+    with db_pool.connection() as conn, conn.cursor() as cursor:
+        county_id = get_county_id(cursor, COUNTY_NAME)
 
-    county_id = get_county_id(cursor, COUNTY_NAME)
     if county_id is None:
         print(f"County '{COUNTY_NAME}' not found in database.")
-        cursor.close()
-        conn.close()
-        return
+        sys.exit(1)
     else:
         print(f"County '{COUNTY_NAME}' has ID: {county_id}")
 
-    cursor.close()
-    conn.close()
-
-    records = parse_abstract_data(raw_data, county_id)
-    if records:
-        insert_abstract_records(records)
-    else:
+    path = file_path or os.path.join(BASE_DIR, file_name)
+    parsed, _ = insert_abstract_records(iter_abstract_file(path, county_id, READ_CHARS))
+    if not parsed:
         print("No records found to insert.")
 
 if __name__ == '__main__':
@@ -1,4 +1,9 @@
+import sys
+import time
 import pymysql
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from db_pool import ConnectionPool
+from checkpoint import clear_checkpoint, get_checkpoint, save_checkpoint
 
 db_config = {
     'host': '',
@@ -13,83 +18,210 @@ BATCH_SIZE = 2000
 
 COUNTY_ID = 0
 
-def get_prserv_batch(cursor, offset):
+# Parallel mode: disjoint PRSERV ranges, each on its own worker and connection
+PARTITIONS = 1
+DEADLOCK_RETRIES = 5
+RETRYABLE_ERRORS = {1205, 1213}  # lock wait timeout, deadlock
+
+# One connection per partition; created in main() once PARTITIONS is final
+db_pool = None
+
+INSERT_RANGE_SQL = """
+    INSERT IGNORE INTO Document (
+        PRSERV,
+        countyID,
+        volume,
+        page,
+        filingDate,
+        instrumentDate,
+        remarks,
+        legalDescription,
+        subBlock,
+        abstractID,
+        acres,
+        instrumentType,
+        clerkNumber,
+        lienAmount,
+        GFNNumber
+    )
+    SELECT
+        p.PRSERV,
+        %(county_id)s AS countyID,
+        p.Volume,
+        p.Page,
+        p.Filing_Date,
+        p.Instrument_Date,
+        p.Remarks,
+        p.Legal_Description,
+        p.Sub_Block_Lot,
+        p.Abst_Svy,
+        p.Acres,
+        p.Book,
+        p.Clerk_Number,
+        p.Lien_Amount,
+        p.GF_Number
+    FROM Prime_Staging p
+    LEFT JOIN Document d
+      ON d.PRSERV = p.PRSERV
+     AND d.countyID = %(county_id)s
+    WHERE p.PRSERV > %(lo)s
+      AND p.PRSERV <= %(hi)s
+      AND d.documentID IS NULL
+"""
+
+def checkpoint_job():
+    """ETL_Checkpoint job name for the current COUNTY_ID; batches resume after
+    the last committed PRSERV."""
+    return f"batchDocument:{COUNTY_ID}"
+
+def get_batch_upper_bound(cursor, after, end=None):
+    """Returns the PRSERV ending the next batch of up to BATCH_SIZE staging rows
+    after `after` (keyset pagination on the PRSERV index), or None when done.
+    With `end`, batches never extend past that PRSERV."""
+    end_filter = "AND PRSERV <= %s" if end is not None else ""
+    end_args = (end,) if end is not None else ()
+
     cursor.execute(f"""
-        SELECT DISTINCT PRSERV FROM Prime_Staging
+        SELECT PRSERV FROM Prime_Staging
+        WHERE PRSERV > %s {end_filter}
         ORDER BY PRSERV
-        LIMIT {BATCH_SIZE} OFFSET {offset}
-    """)
-    return [row['PRSERV'] for row in cursor.fetchall()]
+        LIMIT 1 OFFSET %s
+    """, (after, *end_args, BATCH_SIZE - 1))
+    row = cursor.fetchone()
+    if row:
+        return row['PRSERV']
+
+    # Fewer than BATCH_SIZE rows left: the last batch ends at the max PRSERV
+    cursor.execute(f"SELECT MAX(PRSERV) AS hi FROM Prime_Staging WHERE PRSERV > %s {end_filter}",
+                   (after, *end_args))
+    return cursor.fetchone()['hi']
+
+def is_retryable(error):
+    return isinstance(error, pymysql.err.OperationalError) and error.args[0] in RETRYABLE_ERRORS
 
-def batch_insert(offset=0):
-    conn = pymysql.connect(**db_config)
+def insert_batch(conn, cursor, lo, hi, job):
+    """Inserts (lo, hi] and checkpoints hi in one transaction, retrying on
+    deadlock or lock wait timeout."""
+    for attempt in range(DEADLOCK_RETRIES + 1):
+        try:
+            cursor.execute(INSERT_RANGE_SQL, {'county_id': COUNTY_ID, 'lo': lo, 'hi': hi})
+            inserted = cursor.rowcount
+            save_checkpoint(cursor, job, hi)
+            conn.commit()
+            return inserted
+        except pymysql.err.OperationalError as e:
+            conn.rollback()
+            if not is_retryable(e) or attempt == DEADLOCK_RETRIES:
+                raise
+            time.sleep(0.1 * 2 ** attempt)
+
+def insert_range(conn, lo, end, job, start_after=None, label=''):
+    """
+    Copies Prime_Staging rows with lo < PRSERV <= end (end=None: no limit)
+    into Document in keyset batches, resuming from job's checkpoint. The
+    checkpoint is cleared once the range is exhausted, so the next run over
+    new staging data starts from the beginning.
+    """
+    total_inserted = 0
     cursor = conn.cursor()
 
+    after = start_after
+    if after is None:
+        after = get_checkpoint(cursor, job) or lo
+        if after != lo:
+            print(f"{label}Resuming after PRSERV {after}")
+
+    while True:
+        hi = get_batch_upper_bound(cursor, after, end)
+        if hi is None:
+            break  # no more batches
+
+        inserted = insert_batch(conn, cursor, after, hi, job)
+        print(f"{label}Batch {after or '<start>'} → {hi}: inserted {inserted} rows")
+        total_inserted += inserted
+        after = hi
+
+    clear_checkpoint(cursor, job)
+    conn.commit()
+    cursor.close()
+    return total_inserted
+
+def batch_insert(job, start_after=None):
+    """
+    Copies Prime_Staging into Document in PRSERV ranges (lo, hi].
+
+    Each range is inserted and checkpointed in one transaction, so after a
+    failure a rerun resumes from the last committed PRSERV. Pass start_after
+    to override the checkpoint ('' starts from the beginning).
+    """
+    with db_pool.connection() as conn:
+        total_inserted = insert_range(conn, '', None, job, start_after)
+
+    print(f"Batch insert complete, total inserted rows: {total_inserted}")
+
+def sample_partition_bounds(cursor, partitions):
+    """Splits the staging PRSERV key space into `partitions` disjoint ranges
+    of roughly equal row count, using quantile PRSERVs as boundaries."""
+    cursor.execute("SELECT COUNT(*) AS n FROM Prime_Staging")
+    total = cursor.fetchone()['n']
+    boundaries = []
+    for i in range(1, partitions):
+        cursor.execute("""
+            SELECT PRSERV FROM Prime_Staging
+            ORDER BY PRSERV
+            LIMIT 1 OFFSET %s
+        """, (total * i // partitions,))
+        row = cursor.fetchone()
+        if row and (not boundaries or row['PRSERV'] > boundaries[-1]):
+            boundaries.append(row['PRSERV'])
+    return list(zip([''] + boundaries, boundaries + [None]))
+
+def partitioned_insert(job, partitions):
+    """
+    Runs the staging -> Document transfer as `partitions` disjoint PRSERV
+    ranges, each on its own worker and connection with its own checkpoint.
+    Checkpoint names extend `job` with the range bounds, so a rerun over
+    unchanged staging data resumes every unfinished partition where it stopped.
+    Returns the number of partitions that failed.
+    """
+    with db_pool.connection() as conn, conn.cursor() as cursor:
+        bounds = sample_partition_bounds(cursor, partitions)
+    print(f"Split Prime_Staging into {len(bounds)} partitions")
+
+    def run_partition(index, lo, end):
+        with db_pool.connection() as conn:
+            return insert_range(conn, lo, end, f"{job}:{lo}-{end or ''}", label=f"[p{index}] ")
+
     total_inserted = 0
-    try:
-        while True:
-            prserv_batch = get_prserv_batch(cursor, offset)
-            if not prserv_batch:
-                break  # no more batches
-
-            # Prepare string list for SQL IN clause with proper escaping
-            prserv_list = ",".join(cursor.connection.escape(p) for p in prserv_batch)
-
-            insert_query = f"""
-                INSERT IGNORE INTO Document (
-                    PRSERV,
-                    countyID,
-                    volume,
-                    page,
-                    filingDate,
-                    instrumentDate,
-                    remarks,
-                    legalDescription,
-                    subBlock,
-                    abstractID,
-                    acres,
-                    instrumentType,
-                    clerkNumber,
-                    lienAmount,
-                    GFNNumber
-                )
-                SELECT
-                    p.PRSERV,
-                    {COUNTY_ID} AS countyID,
-                    p.Volume,
-                    p.Page,
-                    p.Filing_Date,
-                    p.Instrument_Date,
-                    p.Remarks,
-                    p.Legal_Description,
-                    p.Sub_Block_Lot,
-                    p.Abst_Svy,
-                    p.Acres,
-                    p.Book,
-                    p.Clerk_Number,
-                    p.Lien_Amount,
-                    GF_Number
-                FROM Prime_Staging p
-                WHERE p.PRSERV IN ({prserv_list})
-                AND NOT EXISTS (
-                    SELECT 1 FROM Document d
-                    WHERE d.PRSERV = p.PRSERV
-                        AND d.countyID = {COUNTY_ID}
-                );
-            """
-
-            cursor.execute(insert_query)
-            conn.commit()
-            inserted = cursor.rowcount
-            print(f"Batch starting at offset {offset}: inserted {inserted} rows")
-            total_inserted += inserted
+    failed = 0
+    with ThreadPoolExecutor(max_workers=len(bounds)) as executor:
+        futures = {executor.submit(run_partition, i, lo, end): i for i, (lo, end) in enumerate(bounds)}
+        for future in as_completed(futures):
+            try:
+                total_inserted += future.result()
+            except Exception as e:
+                failed += 1
+                print(f"Partition p{futures[future]} failed (rerun to resume it): {e}")
 
-            offset += BATCH_SIZE
+    print(f"Partitioned insert complete, total inserted rows: {total_inserted}")
+    return failed
+
+def main():
+    global db_pool
+    db_pool = ConnectionPool(db_config, size=max(1, PARTITIONS))
+    job = checkpoint_job()
+    try:
+        if PARTITIONS > 1:
+            failed = partitioned_insert(job, PARTITIONS)
+        else:
+            batch_insert(job)
+            failed = 0
     finally:
-        cursor.close()
-        conn.close()
+        db_pool.close()
 
-    print(f"Batch insert complete, total inserted rows: {total_inserted}")
+    if failed:
+        print(f"{failed} partition(s) failed")
+        sys.exit(1)
 
 if __name__ == "__main__":
-    batch_insert()
+    main()
@@ -1,5 +1,10 @@
+import time
 import pymysql
 from tqdm import tqdm
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from db_pool import ConnectionPool
+from checkpoint import clear_checkpoint, get_checkpoint, save_checkpoint
+from metrics import ACTIVE_WORKERS, DB_STATEMENT_SECONDS, QUEUE_DEPTH, ROWS_INSERTED, start_exporter
 
 db_config = {
     'host': '',
@@ -12,21 +17,45 @@ db_config = {
 BATCH_SIZE = 5000
 COUNTY_ID = 0
 
+# Scheduler: chunks from the Grantor and Grantee passes share WORKERS
+# connections; each pass resizes its documentID ranges so a statement takes
+# about TARGET_SECONDS
+WORKERS = 8
+TARGET_SECONDS = 2.0
+MIN_BATCH_SIZE = 500
+MAX_BATCH_SIZE = 200000
+DEADLOCK_RETRIES = 5
+RETRYABLE_ERRORS = {1205, 1213}  # lock wait timeout, deadlock
+
+# Metrics snapshot ('.json' for JSON, otherwise Prometheus text; None = off),
+# rewritten every METRICS_INTERVAL seconds and at exit
+METRICS_PATH = None
+METRICS_INTERVAL = 15
+
+PASSES = [
+    ('Multi_Staging', 'Grantor', 'Grantor'),
+    ('Multi_Staging', 'Grantee', 'Grantee'),
+    ('Prime_Staging', 'Grantor', 'Grantor'),
+    ('Prime_Staging', 'Grantee', 'Grantee'),
+]
+
+# WORKERS connections plus one for checkpoint writes from the scheduler
+# thread; created in main() once WORKERS is final
+db_pool = None
+
 def get_doc_bounds():
-    conn = pymysql.connect(**db_config)
-    with conn.cursor() as cursor:
+    with db_pool.connection() as conn, conn.cursor() as cursor:
         cursor.execute("""
             SELECT MIN(documentID), MAX(documentID)
             FROM Document
             WHERE countyID = %s
         """, (COUNTY_ID,))
         lo, hi = cursor.fetchone()
-    conn.close()
     return lo, hi
 
 def insert_chunk(table, column, role, lo, hi):
-    conn = pymysql.connect(**db_config)
-    with conn.cursor() as cursor:
+    with db_pool.connection() as conn, conn.cursor() as cursor, \
+            DB_STATEMENT_SECONDS.time(statement=f'party_chunk:{table}.{column}'):
         cursor.execute(f"""
             INSERT IGNORE INTO Party (documentID, name, role, countyID)
             SELECT d.documentID, m.{column}, '{role}', d.countyID
@@ -44,33 +73,171 @@ def insert_chunk(table, column, role, lo, hi):
               AND p.documentID IS NULL;
         """, (COUNTY_ID, lo, hi))
         conn.commit()
+        ROWS_INSERTED.inc(cursor.rowcount, table='Party')
         return cursor.rowcount
 
-def run_chunked(table, column, role):
+def insert_chunk_with_retry(table, column, role, lo, hi):
+    for attempt in range(DEADLOCK_RETRIES + 1):
+        try:
+            return insert_chunk(table, column, role, lo, hi)
+        except pymysql.err.OperationalError as e:
+            if e.args[0] not in RETRYABLE_ERRORS or attempt == DEADLOCK_RETRIES:
+                raise
+            time.sleep(0.1 * 2 ** attempt)
+
+class PassState:
+    """
+    Chunk bookkeeping for one (table, column, role) pass.
+
+    Ranges are handed out in documentID order and may finish out of order;
+    the high-water mark only advances over a contiguous run of finished
+    ranges, so resuming from it never skips work.
+    """
+
+    def __init__(self, table, column, role, lo, hi, resume_from=None):
+        self.table = table
+        self.column = column
+        self.role = role
+        self.hi = hi
+        self.next_start = lo if resume_from is None else max(lo, resume_from + 1)
+        self.batch_size = BATCH_SIZE
+        self.outstanding = {}  # start -> [end, done]
+        self.high_water = self.next_start - 1
+        self.inserted = 0
+
+    @property
+    def job(self):
+        return f"batchParty:{COUNTY_ID}:{self.table}.{self.column}"
+
+    def has_more(self):
+        return self.next_start <= self.hi
+
+    def is_done(self):
+        """All ranges handed out and committed."""
+        return not self.has_more() and not self.outstanding
+
+    def take_range(self):
+        start = self.next_start
+        end = min(start + self.batch_size - 1, self.hi)
+        self.outstanding[start] = [end, False]
+        self.next_start = end + 1
+        return start, end
+
+    def finish_range(self, start, inserted, seconds):
+        """Marks a range done, retunes the batch size from its latency and
+        returns True if the high-water mark advanced."""
+        self.inserted += inserted
+        self.outstanding[start][1] = True
+
+        # Scale the measured range toward TARGET_SECONDS, at most 2x per step
+        # in either direction
+        size = self.outstanding[start][0] - start + 1
+        factor = min(2.0, max(0.5, TARGET_SECONDS / max(seconds, 1e-3)))
+        self.batch_size = int(min(MAX_BATCH_SIZE, max(MIN_BATCH_SIZE, size * factor)))
+
+        advanced = False
+        while self.outstanding:
+            first = min(self.outstanding)
+            end, done = self.outstanding[first]
+            if not done:
+                break
+            del self.outstanding[first]
+            self.high_water = end
+            advanced = True
+        return advanced
+
+def current_passes(states):
+    """
+    (index, state) of the pass each role is working on: the first unfinished
+    one in PASSES order. Passes with the same role insert into the same
+    documentIDs, and the LEFT JOIN dedup in insert_chunk only sees committed
+    rows (Party has no unique key), so they must run one after the other.
+    """
+    current = {}
+    for index, state in enumerate(states):
+        if not state.is_done():
+            current.setdefault(state.role, (index, state))
+    return list(current.values())
+
+def run_scheduled(passes=PASSES, workers=WORKERS):
+    """
+    Runs chunk ranges on `workers` connections, resuming each pass from its
+    recorded high-water documentID. Passes for different roles run side by
+    side; a pass starts once the previous pass for its role has finished.
+    """
     lo, hi = get_doc_bounds()
-    total_batches = ((hi - lo) // BATCH_SIZE) + 1
+    if lo is None:
+        print(f"No Documents for countyID {COUNTY_ID}")
+        return
+    print(f"documentID {lo} → {hi}")
+
+    with db_pool.connection() as conn, conn.cursor() as cursor:
+        states = []
+        for table, column, role in passes:
+            resume = get_checkpoint(cursor, f"batchParty:{COUNTY_ID}:{table}.{column}")
+            if resume is not None:
+                resume = int(resume)
+                print(f"{table} {role}: resuming after documentID {resume}")
+            states.append(PassState(table, column, role, lo, hi, resume))
+            if states[-1].is_done():
+                # Finished in an earlier run that stopped before clearing it
+                clear_checkpoint(cursor, states[-1].job)
+        conn.commit()
+
+    bars = [tqdm(total=hi - lo + 1, initial=max(0, s.next_start - lo), desc=f"{s.table} {s.role}",
+                 unit="id", position=i) for i, s in enumerate(states)]
 
-    print(f"{table} {role}: documentID {lo} → {hi}")
+    def run(state, start, end):
+        began = time.perf_counter()
+        with ACTIVE_WORKERS.track(pool='party_chunks'):
+            inserted = insert_chunk_with_retry(state.table, state.column, state.role, start, end)
+        return inserted, time.perf_counter() - began
 
-    with tqdm(total=total_batches, desc=f"{table} {role}", unit="batch") as pbar:
-        start = lo
-        total_inserted = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        running = {}
+        while True:
+            # Keep the pool full, round-robin across the current pass of each role
+            while len(running) < workers:
+                ready = [(i, s) for i, s in current_passes(states) if s.has_more()]
+                if not ready:
+                    break
+                for index, state in ready:
+                    if len(running) < workers:
+                        start, end = state.take_range()
+                        running[executor.submit(run, state, start, end)] = (index, start, end)
+            QUEUE_DEPTH.set(len(running), queue='party_ranges')
+            if not running:
+                break
 
-        while start <= hi:
-            end = start + BATCH_SIZE - 1
-            inserted = insert_chunk(table, column, role, start, end)
-            total_inserted += inserted
-            pbar.update(1)
-            pbar.set_postfix(inserted=total_inserted)
-            start = end + 1
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                index, start, end = running.pop(future)
+                state = states[index]
+                inserted, seconds = future.result()
+                bars[index].update(end - start + 1)
+                bars[index].set_postfix(inserted=state.inserted + inserted, batch=state.batch_size)
+                if state.finish_range(start, inserted, seconds):
+                    with db_pool.connection() as conn, conn.cursor() as cursor:
+                        # A finished pass starts over from lo on the next run
+                        if state.is_done():
+                            clear_checkpoint(cursor, state.job)
+                        else:
+                            save_checkpoint(cursor, state.job, str(state.high_water))
+                        conn.commit()
 
-    print(f"{table} {role}: DONE ({total_inserted} rows inserted)")
+    for bar in bars:
+        bar.close()
+    for state in states:
+        print(f"{state.table} {state.role}: DONE ({state.inserted} rows inserted)")
 
 def main():
-    run_chunked('Multi_Staging', 'Grantor', 'Grantor')
-    run_chunked('Multi_Staging', 'Grantee', 'Grantee')
-    run_chunked('Prime_Staging', 'Grantor', 'Grantor')
-    run_chunked('Prime_Staging', 'Grantee', 'Grantee')
+    global db_pool
+    db_pool = ConnectionPool(db_config, size=WORKERS + 1)
+    start_exporter(METRICS_PATH, 'batchParty', METRICS_INTERVAL)
+    try:
+        run_scheduled(PASSES, WORKERS)
+    finally:
+        db_pool.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,325 @@
+import argparse
+import collections
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+from synthetic_data import generate
+
+DEFAULT_OUTPUT = 'bench_results.json'
+SPLIT_THREADS = 4
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None if unknown)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+# --- PARSER BENCHMARKS (rows processed are returned) ---
+
+def bench_parse_index1(data, options):
+    from uploadDocuments import parse_index1
+    return sum(sum(1 for _ in parse_index1(path)) for path in data['index1'])
+
+
+def bench_parse_index2(data, options):
+    from uploadDocuments import parse_index2
+    rows = 0
+    for path in data['index2']:
+        parsed = parse_index2(path)
+        rows += sum(len(names) for names in parsed['grantors'].values())
+    return rows
+
+
+def bench_parse_abstract_data(data, options):
+    from abstract_to_db import iter_abstract_file
+    return sum(1 for _ in iter_abstract_file(data['abstracts'], 1))
+
+
+def bench_split_path(data, options):
+    """process_file_multithreaded over the raw prime files with a counting chunk function."""
+    from txt_to_db import process_file_multithreaded
+
+    def count_chunk(records, headers):
+        return sum(1 for _ in records)
+
+    return sum(process_file_multithreaded(path, count_chunk, options['split_threads'])
+               for path in data['prime_raw'])
+
+
+def bench_clean_file(data, options):
+    from cleanFile import clean_file
+    out_path = os.path.join(options['scratch'], 'cleaned.txt')
+    for path in data['prime_raw']:
+        clean_file(path, out_path)
+    os.remove(out_path)
+    return data['prime_rows']
+
+
+def bench_count_files(data, options):
+    from countFiles import count_rows
+    return sum(count_rows(path) for path in data['prime_fixed'] + data['multi_fixed'])
+
+
+# --- DB LOADER BENCHMARKS (need --db-config pointing at a local MySQL) ---
+
+def configure_db(module, options):
+    from pipeline import apply_settings
+    name = 'DB_CONFIG' if hasattr(module, 'DB_CONFIG') else 'db_config'
+    apply_settings(module, {name: options['db_config']})
+
+
+def _bench_staging_load(data, options, kind):
+    """LOAD DATA of the fixed files into the staging table, rolled back afterwards."""
+    import loadFilesToDB
+    from db_pool import BULK_LOAD_SESSION, ConnectionPool
+    configure_db(loadFilesToDB, options)
+    load_func = loadFilesToDB.load_prime_file_into_table if kind == 'prime' else loadFilesToDB.load_multi_file_into_table
+    table = options[f'{kind}_table']
+
+    rows = 0
+    pool = ConnectionPool(loadFilesToDB.DB_CONFIG, size=1, session=BULK_LOAD_SESSION)
+    with pool.connection() as conn, conn.cursor() as cursor:
+        for path in data[f'{kind}_fixed']:
+            rows += load_func(cursor, path, table)
+        conn.rollback()
+    pool.close()
+    return rows
+
+
+def bench_load_prime_staging(data, options):
+    return _bench_staging_load(data, options, 'prime')
+
+
+def bench_load_multi_staging(data, options):
+    return _bench_staging_load(data, options, 'multi')
+
+
+def bench_insert_abstracts(data, options):
+    import abstract_to_db
+    configure_db(abstract_to_db, options)
+    parsed, _ = abstract_to_db.insert_abstract_records(
+        abstract_to_db.iter_abstract_file(data['abstracts'], options['county_id']))
+    abstract_to_db.db_pool.close()
+    return parsed
+
+
+class _NoCommit:
+    """Connection wrapper that ignores commit(), so a benchmark can roll back."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return self.conn.cursor(*args, **kwargs)
+
+    def commit(self):
+        pass
+
+
+def _insert_prime_files(txt_to_db, db, data, options):
+    """Prime chunk inserts over the raw prime files, uncommitted; returns rows inserted."""
+    from eor_reader import iter_records, read_header
+    abstract_lookup = txt_to_db.AbstractLookup(options['county_id'])
+    rejected = collections.Counter()
+    rows = 0
+    for path in data['prime_raw']:
+        headers, data_start = read_header(path)
+        if headers is not None:
+            rows += txt_to_db.insert_prime_records(db, iter_records(path, data_start), headers,
+                                                   abstract_lookup, None, rejected)
+    return rows
+
+
+def _bench_txt_to_db(data, options, kind):
+    """
+    txt_to_db's prime or multi chunk inserts on one connection, rolled back
+    afterwards. The multi run first inserts the prime Documents it resolves
+    against; only its Party inserts are timed.
+    """
+    import txt_to_db
+    from db_pool import ConnectionPool
+    from eor_reader import iter_records, read_header
+    configure_db(txt_to_db, options)
+    txt_to_db.COUNTY_ID = options['county_id']
+
+    pool = ConnectionPool(txt_to_db.DB_CONFIG, size=1, session=txt_to_db.DB_SESSION)
+    txt_to_db.db_pool = pool
+    try:
+        with pool.connection() as conn:
+            db = _NoCommit(conn)
+            start = time.perf_counter()
+            rows = _insert_prime_files(txt_to_db, db, data, options)
+            if kind == 'multi':
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT PRSERV, documentID FROM Document WHERE countyID = %s",
+                                   (options['county_id'],))
+                    prserv_map = dict(cursor.fetchall())
+                unresolved = set()
+                start = time.perf_counter()
+                rows = 0
+                for path in data['multi_raw']:
+                    headers, data_start = read_header(path)
+                    if headers is not None:
+                        rows += txt_to_db.insert_multi_records(db, iter_records(path, data_start), headers,
+                                                               prserv_map, unresolved)
+            seconds = time.perf_counter() - start
+            conn.rollback()
+    finally:
+        pool.close()
+    return rows, seconds
+
+
+def bench_insert_prime_chunks(data, options):
+    return _bench_txt_to_db(data, options, 'prime')
+
+
+def bench_insert_multi_chunks(data, options):
+    return _bench_txt_to_db(data, options, 'multi')
+
+
+PARSER_BENCHMARKS = {
+    'parse_index1': bench_parse_index1,
+    'parse_index2': bench_parse_index2,
+    'parse_abstract_data': bench_parse_abstract_data,
+    'split_path': bench_split_path,
+    'clean_file': bench_clean_file,
+    'count_files': bench_count_files,
+}
+DB_BENCHMARKS = {
+    'load_prime_staging': bench_load_prime_staging,
+    'load_multi_staging': bench_load_multi_staging,
+    'insert_abstracts': bench_insert_abstracts,
+    'insert_prime_chunks': bench_insert_prime_chunks,
+    'insert_multi_chunks': bench_insert_multi_chunks,
+}
+
+
+def run_benchmark(name, data, options):
+    """Runs one benchmark; called in a fresh process so peak RSS is its own."""
+    func = {**PARSER_BENCHMARKS, **DB_BENCHMARKS}[name]
+    baseline_rss = peak_rss_mb()
+    start = time.perf_counter()
+    rows = func(data, options)
+    seconds = time.perf_counter() - start
+    # Benchmarks with untimed setup return (rows, timed seconds)
+    if isinstance(rows, tuple):
+        rows, seconds = rows
+    peak = peak_rss_mb()
+    return {
+        'name': name,
+        'rows': rows,
+        'seconds': round(seconds, 4),
+        'rows_per_s': round(rows / seconds, 1) if seconds > 0 else None,
+        'peak_rss_mb': round(peak, 1) if peak is not None else None,
+        'rss_growth_mb': round(peak - baseline_rss, 1) if peak is not None else None,
+    }
+
+
+def run_isolated(name, data, options):
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+        return executor.submit(run_benchmark, name, data, options).result()
+
+
+def compare(results, baseline_path):
+    """Prints rows/s against a previous results file."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {r['name']: r for r in json.load(f)['results']}
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        before = baseline.get(result['name'])
+        if not before or not before.get('rows_per_s') or not result.get('rows_per_s'):
+            continue
+        ratio = result['rows_per_s'] / before['rows_per_s']
+        print(f"  {result['name']:<22} {ratio:6.2f}x rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ETL parsers and loaders on synthetic data.")
+    parser.add_argument("--data-dir", help="Generate the data here and keep it (default: a temp dir, removed after)")
+    parser.add_argument("--folders", type=int, default=2)
+    parser.add_argument("--prime-rows", type=int, default=50000, help="Prime rows per folder")
+    parser.add_argument("--index-lines", type=int, default=50000, help="INDEX1 lines per folder")
+    parser.add_argument("--abstracts", type=int, default=20000)
+    parser.add_argument("--only", action="append", default=[], metavar="NAME", help="Run only these benchmarks")
+    parser.add_argument("--split-threads", type=int, default=SPLIT_THREADS)
+    parser.add_argument("--db-config", help="JSON file with pymysql connect args for a local MySQL stand-in")
+    parser.add_argument("--prime-table", default='Prime_Staging')
+    parser.add_argument("--multi-table", default='Multi_Staging')
+    parser.add_argument("--county-id", type=int, default=1)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Results JSON to write")
+    parser.add_argument("--compare", help="Previous results JSON to compare rows/s against")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='titlehero_bench_')
+    print(f"Generating synthetic county in {data_dir}...")
+    data = generate(data_dir, folders=args.folders, prime_rows=args.prime_rows,
+                    index_lines=args.index_lines, abstracts=args.abstracts)
+
+    options = {
+        'scratch': data_dir,
+        'split_threads': args.split_threads,
+        'prime_table': args.prime_table,
+        'multi_table': args.multi_table,
+        'county_id': args.county_id,
+        'db_config': None,
+    }
+    names = list(PARSER_BENCHMARKS)
+    if args.db_config:
+        with open(args.db_config, 'r', encoding='utf-8') as f:
+            options['db_config'] = json.load(f)
+        options['db_config'].setdefault('local_infile', True)
+        names += list(DB_BENCHMARKS)
+    if args.only:
+        names = [n for n in names if n in args.only]
+
+    results = []
+    try:
+        for name in names:
+            try:
+                result = run_isolated(name, data, options)
+            except Exception as e:
+                print(f"{name:<22} FAILED: {e}")
+                results.append({'name': name, 'error': str(e)})
+                continue
+            results.append(result)
+            rss = f"{result['peak_rss_mb']:8.1f} MB" if result['peak_rss_mb'] is not None else '       n/a'
+            print(f"{name:<22} {result['rows']:>10,} rows {result['seconds']:8.2f}s "
+                  f"{result['rows_per_s'] or 0:>12,.0f} rows/s {rss}")
+    finally:
+        if args.data_dir is None:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = {
+        'run_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scale': {k: data[k] for k in ('prime_rows', 'multi_rows', 'index1_rows', 'index2_rows', 'abstract_rows')},
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
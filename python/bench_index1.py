@@ -0,0 +1,81 @@
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from synthetic_data import write_index1
+from uploadDocuments import parse_index1
+
+COLUMNS = [
+    ('FileName', 30),
+    ('Grantor', 40),
+    ('Grantee', 40),
+    ('instrumentType', 22),
+    ('fileStampDate', 22),
+    ('fileDate', 8),
+    ('legalDescription', 42),
+    ('filename', None),
+]
+
+
+def legacy_parse_index1(file_path):
+    """The original per-column parser, kept here as the benchmark baseline."""
+    data = []
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            pos = 0
+            record = {}
+            for col_name, width in COLUMNS:
+                if width is None:
+                    record[col_name] = line[pos:].rstrip('\n').strip()
+                    break
+                record[col_name] = line[pos:pos+width].strip()
+                pos += width
+            record['fileStampDate'] = record['fileStampDate'][9:]
+            fileDate_dt = datetime.strptime(record['fileDate'], '%m%d%Y').date()
+            fileStampDate_dt = datetime.strptime(record['fileStampDate'], '%m%d%Y%H:%M')
+            record['fileDate'] = fileDate_dt.strftime('%Y-%m-%d')
+            record['fileStampDate'] = fileStampDate_dt.strftime('%Y-%m-%d %H:%M:%S')
+            data.append(record)
+    return data
+
+
+def time_parser(label, parse, file_path, lines):
+    start = time.perf_counter()
+    result = list(parse(file_path))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {elapsed:8.3f}s  {lines / elapsed:>12,.0f} lines/s")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare INDEX1 parser throughput.")
+    parser.add_argument("--file", help="Existing INDEX1.TXT to parse (default: generate one)")
+    parser.add_argument("--lines", type=int, default=200_000, help="Lines to generate when --file is not given")
+    args = parser.parse_args()
+
+    file_path = args.file
+    if file_path is None:
+        fd, file_path = tempfile.mkstemp(suffix='_INDEX1.TXT')
+        os.close(fd)
+        write_index1(file_path, args.lines)
+
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            lines = sum(1 for _ in f)
+        print(f"Parsing {lines:,} lines from {file_path}")
+
+        legacy, legacy_time = time_parser('legacy', legacy_parse_index1, file_path, lines)
+        current, current_time = time_parser('layout', parse_index1, file_path, lines)
+
+        if legacy != current:
+            print("WARNING: parsers produced different records")
+        print(f"Speedup: {legacy_time / current_time:.2f}x")
+    finally:
+        if args.file is None:
+            os.remove(file_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,21 @@
+# Helpers for the ETL_Checkpoint table (see etl_checkpoint.sql)
+
+def get_checkpoint(cursor, job):
+    """Returns the last committed key for job, or None if it has not run."""
+    cursor.execute("SELECT last_key FROM ETL_Checkpoint WHERE job = %s", (job,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    return row['last_key'] if isinstance(row, dict) else row[0]
+
+
+def save_checkpoint(cursor, job, last_key):
+    """Records last_key for job; commit it together with the batch it covers."""
+    cursor.execute("""
+        INSERT INTO ETL_Checkpoint (job, last_key) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE last_key = VALUES(last_key)
+    """, (job, last_key))
+
+
+def clear_checkpoint(cursor, job):
+    cursor.execute("DELETE FROM ETL_Checkpoint WHERE job = %s", (job,))
@@ -1,27 +1,100 @@
+import argparse
+import time
+
 INPUT_FILE = ""
 OUTPUT_FILE = ""
 
-with open(INPUT_FILE, "rb") as f:
-    data = f.read()
-
-records = data.split(b"{EOR}")
-
-with open(OUTPUT_FILE, "w", encoding="latin1", errors="ignore") as out:
-    for rec in records:
-        cleaned = rec.replace(b"\x00", b"")
-
-        if cleaned:
-            line = cleaned.decode("latin1", errors="ignore") + '\n'
-
-            out.write(line)
-        
-        # print("Index | Character | Unicode | Note")
-        # print("----------------------------------")
-        # for i, ch in enumerate(line):
-        #     note = "" 
-        #     if ch == '\t': 
-        #         note = "<TAB>" 
-        #     elif ch == ' ':
-        #         note = "<SPACE>"
-        #     print(f"{i:5} | {repr(ch):9} | {ord(ch):7} | {note}")
-        # break
\ No newline at end of file
+EOR = b"{EOR}"
+CHUNK_SIZE = 16 * 1024 * 1024
+WRITE_BUFFER = 16 * 1024 * 1024
+
+
+def clean_records(records, has_nul=True):
+    """NUL-strips records and joins the non-empty ones, one per line."""
+    # Records that are empty (or all NULs) are dropped, as before; the
+    # per-record strip only runs when the buffer actually holds NULs
+    if has_nul:
+        records = [r for r in records if r.strip(b"\x00")]
+    elif not all(records):
+        records = [r for r in records if r]
+    if not records:
+        return b""
+    joined = b"\n".join(records) + b"\n"
+    return joined.translate(None, b"\x00") if has_nul else joined
+
+
+def clean_file(input_path, output_path, chunk_size=CHUNK_SIZE):
+    """
+    Rewrites a raw BLU export as one record per line: splits on {EOR},
+    strips NULs and drops empty records, writing latin1 bytes unchanged.
+
+    Works on chunk_size buffers with bulk bytes operations; only the
+    unfinished record at the end of each buffer is carried over, so memory
+    stays constant regardless of file size. A record longer than chunk_size
+    is written out as it streams, keeping back only the bytes that could
+    start a split {EOR}. Returns (bytes_in, bytes_out).
+    """
+    bytes_in = 0
+    bytes_out = 0
+    carry = b""
+    # True once part of the current (unfinished) record has been written
+    partial = False
+
+    with open(input_path, "rb") as f, open(output_path, "wb", buffering=WRITE_BUFFER) as out:
+        while True:
+            chunk = f.read(chunk_size)
+            bytes_in += len(chunk)
+            if not chunk:
+                if partial:
+                    cleaned = carry.translate(None, b"\x00") + b"\n"
+                else:
+                    cleaned = clean_records([carry])
+                out.write(cleaned)
+                bytes_out += len(cleaned)
+                break
+
+            buf = carry + chunk
+            has_nul = b"\x00" in buf
+            records = buf.split(EOR)
+            carry = records.pop()
+            if partial and records:
+                # The rest of a record already partly written: it ends here
+                # and gets its newline even if nothing is left of it
+                tail = records.pop(0).translate(None, b"\x00") + b"\n"
+                out.write(tail)
+                bytes_out += len(tail)
+                partial = False
+            cleaned = clean_records(records, has_nul)
+            out.write(cleaned)
+            bytes_out += len(cleaned)
+
+            if len(carry) > chunk_size:
+                # No {EOR} in a whole buffer: stream the record out instead
+                # of copying an ever-growing carry on every read
+                keep = len(EOR) - 1
+                head = carry[:-keep].translate(None, b"\x00")
+                carry = carry[-keep:]
+                if head:
+                    out.write(head)
+                    bytes_out += len(head)
+                    partial = True
+
+    return bytes_in, bytes_out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split a raw BLU export on {EOR} into NUL-free lines.")
+    parser.add_argument("input", nargs="?", default=INPUT_FILE, help="Raw export file")
+    parser.add_argument("output", nargs="?", default=OUTPUT_FILE, help="Cleaned output file")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Bytes read per buffer")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    bytes_in, bytes_out = clean_file(args.input, args.output, args.chunk_size)
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(f"Cleaned {bytes_in:,} bytes -> {bytes_out:,} bytes in {elapsed:.2f}s "
+          f"({bytes_in / elapsed / (1024 * 1024):,.1f} MB/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,112 @@
+import argparse
+import functools
 import os
+from concurrent.futures import ProcessPoolExecutor
 from glob import glob
 
 PRIME_DIR = ''
 MULTI_DIR = ''
+# Raw exports as laid out for preprocessFiles: <RAW_BASE_DIR>/BLURC*/BLU/*.txt
+RAW_BASE_DIR = ''
+FOLDER_PATTERN = 'BLURC'
+
+# Files are counted BUFFER_SIZE bytes at a time across COUNT_WORKERS processes
+BUFFER_SIZE = 16 * 1024 * 1024
+COUNT_WORKERS = os.cpu_count()
+EOR = b'{EOR}'
+
+
+def count_newlines(file_path, buffer_size=BUFFER_SIZE):
+    """Counts lines like text-mode iteration does: a final unterminated line counts too."""
+    lines = 0
+    last = b'\n'
+    with open(file_path, 'rb', buffering=0) as f:
+        while True:
+            chunk = f.read(buffer_size)
+            if not chunk:
+                break
+            lines += chunk.count(b'\n')
+            last = chunk[-1:]
+    return lines + (last != b'\n')
+
+
+def count_eor_markers(file_path, buffer_size=BUFFER_SIZE):
+    """Counts {EOR} markers, including ones split across buffer boundaries."""
+    markers = 0
+    tail = b''
+    with open(file_path, 'rb', buffering=0) as f:
+        while True:
+            chunk = f.read(buffer_size)
+            if not chunk:
+                break
+            buf = tail + chunk
+            markers += buf.count(EOR)
+            # Too short to hold a whole (already counted) marker
+            tail = buf[-(len(EOR) - 1):]
+    return markers
+
+
+def count_rows(file_path, buffer_size=BUFFER_SIZE):
+    """Data rows in a *_fixed.txt file (all lines minus the header)."""
+    return count_newlines(file_path, buffer_size) - 1
+
+
+def _count_in_pool(counter, file_paths, label, workers):
+    # BUFFER_SIZE is bound here: spawned workers re-import the module and
+    # would not see an override made in the parent
+    counter = functools.partial(counter, buffer_size=BUFFER_SIZE)
+    total = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for file_path, count in zip(file_paths, executor.map(counter, file_paths)):
+            print(f"{file_path}: {count} {label}")
+            total += count
+    return total
+
+
+def count_lines_in_files(file_paths, workers=COUNT_WORKERS):
+    return _count_in_pool(count_rows, file_paths, 'lines', workers)
+
+
+def count_records_in_files(file_paths, workers=COUNT_WORKERS):
+    return _count_in_pool(count_eor_markers, file_paths, 'records', workers)
+
+
+def find_raw_files(base_dir, kind):
+    return sorted(glob(os.path.join(base_dir, f'{FOLDER_PATTERN}*', 'BLU', f'{FOLDER_PATTERN}_{kind}.txt')))
 
-def count_lines_in_files(file_paths):
-    total_lines = 0
-    for file_path in file_paths:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            line_count = sum(1 for _ in f)-1
-        print(f"{file_path}: {line_count} lines")
-        total_lines += line_count
-    return total_lines
 
 def main():
+    parser = argparse.ArgumentParser(description="Count rows in preprocessed files and {EOR} records in raw BLU files.")
+    parser.add_argument("--raw", action="store_true", help="Also count {EOR} records under RAW_BASE_DIR")
+    parser.add_argument("--workers", type=int, default=COUNT_WORKERS, help="Counting processes")
+    args = parser.parse_args()
+
     prime_files = glob(os.path.join(PRIME_DIR, '*_fixed.txt'))
     multi_files = glob(os.path.join(MULTI_DIR, '*_fixed.txt'))
 
     print(f"Found {len(prime_files)} prime files.")
-    total_prime = count_lines_in_files(prime_files)
+    total_prime = count_lines_in_files(prime_files, args.workers)
     print(f"Total lines in prime files: {total_prime}")
 
     print(f"\nFound {len(multi_files)} multi files.")
-    total_multi = count_lines_in_files(multi_files)
+    total_multi = count_lines_in_files(multi_files, args.workers)
     print(f"Total lines in multi files: {total_multi}")
 
-
     print(f"\n Prime rows: {total_prime}")
     print(f"\n Multi rows: {total_multi}")
 
+    if args.raw:
+        raw_prime = find_raw_files(RAW_BASE_DIR, 'prime')
+        raw_multi = find_raw_files(RAW_BASE_DIR, 'multi')
+
+        print(f"\nFound {len(raw_prime)} raw prime files.")
+        records_prime = count_records_in_files(raw_prime, args.workers)
+        print(f"\nFound {len(raw_multi)} raw multi files.")
+        records_multi = count_records_in_files(raw_multi, args.workers)
+
+        print(f"\n Prime records: {records_prime} raw vs {total_prime} rows ({records_prime - total_prime:+})")
+        print(f"\n Multi records: {records_multi} raw vs {total_multi} rows ({records_multi - total_multi:+})")
+
+
 if __name__ == "__main__":
     main()
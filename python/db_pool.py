@@ -0,0 +1,104 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import pymysql
+
+# Session settings for bulk loads into staging tables
+BULK_LOAD_SESSION = {
+    'unique_checks': 0,
+    'foreign_key_checks': 0,
+}
+
+
+def session_init_command(session):
+    """Builds one SET SESSION statement; pymysql re-runs it on every reconnect."""
+    if not session:
+        return None
+    assignments = ', '.join(f"{name} = {value!r}" for name, value in session.items())
+    return f"SET SESSION {assignments}"
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of pymysql connections.
+
+    Connections are opened lazily up to `size`; callers beyond that block until
+    one is returned. Connections idle longer than `ping_interval` seconds are
+    pinged (and reconnected if dropped) before being handed out, and any
+    connection that raised a MySQL error is discarded rather than reused.
+    """
+
+    def __init__(self, config, size=8, session=None, ping_interval=30):
+        self.config = dict(config)
+        init_command = session_init_command(session)
+        if init_command:
+            self.config['init_command'] = init_command
+        self.size = size
+        self.ping_interval = ping_interval
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _open(self):
+        return pymysql.connect(**self.config)
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        self._slots.acquire()
+        try:
+            try:
+                conn, returned_at = self._idle.get_nowait()
+            except queue.Empty:
+                return self._open()
+
+            if not conn.open:
+                self._discard(conn)
+                return self._open()
+            if time.monotonic() - returned_at >= self.ping_interval:
+                conn.ping(reconnect=True)
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn, broken=False):
+        try:
+            if broken or not conn.open:
+                self._discard(conn)
+            else:
+                self._idle.put((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; uncommitted work is rolled back on error."""
+        conn = self.acquire()
+        broken = False
+        try:
+            yield conn
+        except pymysql.err.OperationalError:
+            broken = True
+            raise
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self.release(conn, broken)
+
+    def close(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
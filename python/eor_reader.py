@@ -0,0 +1,89 @@
+import os
+import mmap
+
+EOR = b'{EOR}'
+
+
+def _file_size(file_path):
+    return os.path.getsize(file_path)
+
+
+def iter_raw_records(file_path, start=0, end=None):
+    """Yield raw byte records between {EOR} markers in [start, end) using mmap."""
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        end = size if end is None else min(end, size)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = start
+            while pos < end:
+                idx = mm.find(EOR, pos, end)
+                if idx == -1:
+                    yield mm[pos:end]
+                    return
+                yield mm[pos:idx]
+                pos = idx + len(EOR)
+
+
+def _decode(raw, encoding):
+    """Decodes raw with text-mode newline handling: CRLF and lone CR become LF."""
+    text = raw.decode(encoding)
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+
+def iter_records(file_path, start=0, end=None, encoding='utf-8'):
+    """
+    Lazily yields decoded, non-blank records from an {EOR}-delimited BLU file.
+
+    Matches the old text-mode `content.split('{EOR}')` behaviour: line endings
+    are normalized to LF, leading newlines are stripped from each record and
+    whitespace-only records are skipped.
+    """
+    for raw in iter_raw_records(file_path, start, end):
+        if not raw.strip():
+            continue
+        yield _decode(raw, encoding).lstrip('\n')
+
+
+def read_header(file_path, encoding='utf-8'):
+    """
+    Returns (headers, data_start) where headers is the tab-split first record
+    and data_start is the byte offset of the first data record.
+    Returns (None, 0) for an empty file.
+    """
+    pos = 0
+    for raw in iter_raw_records(file_path):
+        pos += len(raw) + len(EOR)
+        if raw.strip():
+            headers = _decode(raw, encoding).strip('\n').split('\t')
+            return headers, pos
+    return None, 0
+
+
+def shard_ranges(file_path, num_shards, start=0):
+    """
+    Splits [start, EOF) into up to num_shards byte ranges whose boundaries sit
+    directly after an {EOR} marker, so no record straddles two shards.
+    """
+    size = _file_size(file_path)
+    if size <= start or num_shards <= 1:
+        return [(start, size)] if size > start else []
+
+    boundaries = [start]
+    with open(file_path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            step = (size - start) / num_shards
+            for i in range(1, num_shards):
+                target = max(int(start + i * step), boundaries[-1])
+                idx = mm.find(EOR, target)
+                if idx == -1:
+                    break
+                boundary = idx + len(EOR)
+                if boundary > boundaries[-1] and boundary < size:
+                    boundaries.append(boundary)
+    boundaries.append(size)
+
+    return list(zip(boundaries[:-1], boundaries[1:]))
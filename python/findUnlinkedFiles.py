@@ -1,8 +1,14 @@
 import argparse
+import itertools
+import queue
+import threading
 import boto3
 import pymysql
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
 import os
+from db_pool import ConnectionPool
 
 # === CONFIGURATION ===
 DB_HOST = ''
@@ -13,29 +19,34 @@ DB_PASSWORD = ''
 S3_BUCKET = ''
 AWS_REGION = ''
 
+# Object names are 9-character base36 PRSERVs (uploadDocuments.base36_encode)
+BASE36_CHARS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+# PRSERVs fetched per keyset query in --stream mode
+PRSERV_PAGE_SIZE = 10000
+# Listing pages (up to 1,000 keys each) buffered per key range when sharding
+RANGE_BUFFER_PAGES = 4
+
+db_pool = ConnectionPool({
+    'host': DB_HOST,
+    'user': DB_USER,
+    'password': DB_PASSWORD,
+    'database': DB_NAME,
+    'cursorclass': pymysql.cursors.Cursor,
+}, size=1)
+
 
 def get_unique_prserv_values_by_county(county_id):
     query = "SELECT DISTINCT prserv FROM Document WHERE prserv IS NOT NULL AND countyID = %s"
-    conn = None
     prserv_values = set()
 
     try:
-        conn = pymysql.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME,
-            cursorclass=pymysql.cursors.Cursor
-        )
-        with conn.cursor() as cur:
+        with db_pool.connection() as conn, conn.cursor() as cur:
             cur.execute(query, (county_id,))
             rows = cur.fetchall()
             prserv_values = {row[0] for row in rows}
     except Exception as e:
         print(f"Error querying database: {e}")
-    finally:
-        if conn:
-            conn.close()
     return prserv_values
 
 
@@ -51,6 +62,254 @@ def list_s3_files(s3_client, prefix):
     return s3_files
 
 
+def iter_sorted_prserv_values(county_id, page_size=PRSERV_PAGE_SIZE):
+    """
+    Streams distinct PRSERVs in binary (S3 key) order.
+
+    Pages are fetched by keyset, each on a briefly borrowed connection, so no
+    result set stays open while the caller lists and deletes S3 keys (an
+    unread server-side cursor is dropped after net_write_timeout).
+    """
+    query = """
+        SELECT PRSERV FROM Document
+        WHERE PRSERV IS NOT NULL AND countyID = %s
+          AND (%s IS NULL OR CAST(PRSERV AS BINARY) > CAST(%s AS BINARY))
+        ORDER BY CAST(PRSERV AS BINARY)
+        LIMIT %s
+    """
+    last = None
+    while True:
+        with db_pool.connection() as conn, conn.cursor() as cur:
+            cur.execute(query, (county_id, last, last, page_size))
+            rows = cur.fetchall()
+        for (prserv,) in rows:
+            if prserv != last:
+                yield prserv
+                last = prserv
+        if len(rows) < page_size:
+            return
+
+
+def iter_s3_keys(s3_client, prefix):
+    """Streams keys under prefix; S3 returns them in UTF-8 binary order."""
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=S3_BUCKET, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            yield obj['Key']
+
+
+def prserv_bounds(county_id):
+    """(lowest, highest) PRSERV of the county in binary (S3 key) order, or (None, None)."""
+    with db_pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT MIN(CAST(PRSERV AS BINARY)), MAX(CAST(PRSERV AS BINARY)) FROM Document
+            WHERE PRSERV IS NOT NULL AND countyID = %s
+        """, (county_id,))
+        row = cur.fetchone()
+    return tuple(v.decode() if isinstance(v, bytes) else v for v in row) if row else (None, None)
+
+
+def shard_boundaries(prefix, depth, low=None, high=None):
+    """
+    Boundary keys splitting prefix into about 36**depth key ranges.
+
+    PRSERVs are zero-padded, so their leading characters barely vary. Given
+    the lowest and highest name (low, high), the boundaries are spaced evenly
+    between the two on the shortest leading part of the name that varies
+    enough; otherwise the split is on the first `depth` characters.
+    """
+    shards = 36 ** depth
+    if low is None or high is None or not set(low + high) <= set(BASE36_CHARS):
+        return [prefix + ''.join(chars) for chars in itertools.product(BASE36_CHARS, repeat=depth)][1:]
+
+    width = max(len(low), len(high))
+    low, high = low.ljust(width, '0'), high.ljust(width, '0')
+    for w in range(1, width + 1):
+        lo, hi = int(low[:w], 36), int(high[:w], 36)
+        if hi - lo >= shards:
+            break
+    points = sorted({lo + (hi - lo) * i // shards for i in range(1, shards)} - {lo})
+
+    def encode(n):
+        chars = ''
+        for _ in range(w):
+            n, i = divmod(n, 36)
+            chars = BASE36_CHARS[i] + chars
+        return chars
+
+    return [prefix + encode(n) for n in points]
+
+
+def _put(pages, item, stop):
+    """Blocking put that gives up once stop is set."""
+    while not stop.is_set():
+        try:
+            pages.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def list_key_range(s3_client, prefix, start_after, end, pages, stop):
+    """
+    Puts lists of keys under prefix with start_after < key <= end (either
+    bound may be None) on `pages`, then None. Blocks while pages is full.
+    """
+    kwargs = {'Bucket': S3_BUCKET, 'Prefix': prefix}
+    if start_after is not None:
+        kwargs['StartAfter'] = start_after
+    try:
+        paginator = s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(**kwargs):
+            keys = [obj['Key'] for obj in page.get('Contents', [])]
+            past_end = end is not None and keys and keys[-1] > end
+            if past_end:
+                keys = [k for k in keys if k <= end]
+            if keys and not _put(pages, keys, stop):
+                return
+            if past_end:
+                return
+    finally:
+        _put(pages, None, stop)
+
+
+def iter_s3_keys_sharded(s3_client, prefix, depth=1, workers=16, low=None, high=None):
+    """
+    Lists prefix as contiguous key ranges (see shard_boundaries) paged in
+    parallel and yields keys in overall key order.
+
+    Ranges are (boundary_i, boundary_i+1], so keys that are not base36 (lower
+    case, punctuation) or lie outside [low, high] still land in exactly one
+    range. At most `workers` ranges are listed at once, each buffering at
+    most RANGE_BUFFER_PAGES pages, so memory stays bounded.
+    """
+    boundaries = shard_boundaries(prefix, depth, low, high)
+    ranges = iter(zip([None] + boundaries, boundaries + [None]))
+    stop = threading.Event()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit(start_after, end):
+            pages = queue.Queue(maxsize=RANGE_BUFFER_PAGES)
+            return executor.submit(list_key_range, s3_client, prefix, start_after, end, pages, stop), pages
+
+        try:
+            pending = [submit(*r) for r in itertools.islice(ranges, workers)]
+            while pending:
+                future, pages = pending.pop(0)
+                while (keys := pages.get()) is not None:
+                    yield from keys
+                future.result()  # re-raise a failed listing
+                pending.extend(submit(*r) for r in itertools.islice(ranges, 1))
+        finally:
+            stop.set()
+
+
+def make_s3_client(workers):
+    return boto3.client('s3', region_name=AWS_REGION, config=Config(max_pool_connections=max(10, workers)))
+
+
+def find_existing_prserv_values(county_id, names):
+    """Point lookup for the few names the merge-join could not place."""
+    found = set()
+    names = list(names)
+    with db_pool.connection() as conn, conn.cursor() as cur:
+        for i in range(0, len(names), 1000):
+            chunk = names[i:i + 1000]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cur.execute(
+                f"SELECT PRSERV FROM Document WHERE countyID = %s AND PRSERV IN ({placeholders})",
+                (county_id, *chunk),
+            )
+            found.update(row[0] for row in cur.fetchall())
+    return found
+
+
+class DeleteBatcher:
+    """Collects keys and deletes (or lists, in dry-run) them 1,000 at a time."""
+
+    def __init__(self, s3_client, dry_run=True, batch_size=1000):
+        self.s3_client = s3_client
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.pending = []
+        self.total = 0
+
+    def add(self, key):
+        self.pending.append(key)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        self.total += len(self.pending)
+        if self.dry_run:
+            for key in self.pending:
+                print(f"  {key}")
+        else:
+            delete_request = {'Objects': [{'Key': k} for k in self.pending]}
+            try:
+                response = self.s3_client.delete_objects(Bucket=S3_BUCKET, Delete=delete_request)
+                print(f"Deleted {len(response.get('Deleted', []))} files.")
+            except ClientError as e:
+                print(f"Error deleting files: {e}")
+        self.pending = []
+
+
+def stream_unlinked(county_id, s3_prefix, dry_run, shard_depth=0, list_workers=16):
+    """
+    Merge-joins the sorted S3 listing against sorted PRSERVs, deleting
+    unlinked keys in batches as they are found, so memory stays constant.
+
+    A key whose name (minus extension) sorts before the previous key's name,
+    e.g. 'AB-C.tif' after 'AB.tif', can't be placed by the merge; those rare
+    keys are held back and checked with a point lookup at the end.
+    """
+    s3_client = make_s3_client(list_workers)
+    batcher = DeleteBatcher(s3_client, dry_run=dry_run)
+    if dry_run:
+        print("Dry-run mode enabled. The following files would be deleted:")
+
+    prserv_values = iter_sorted_prserv_values(county_id)
+    current = next(prserv_values, None)
+    last_name = None
+    deferred = {}
+    scanned = 0
+
+    if shard_depth:
+        low, high = prserv_bounds(county_id)
+        keys = iter_s3_keys_sharded(s3_client, s3_prefix, shard_depth, list_workers, low, high)
+    else:
+        keys = iter_s3_keys(s3_client, s3_prefix)
+
+    for key in keys:
+        scanned += 1
+        name = os.path.splitext(key[len(s3_prefix):])[0]
+        if last_name is not None and name < last_name:
+            deferred.setdefault(name, []).append(key)
+            continue
+        last_name = name
+
+        while current is not None and current < name:
+            current = next(prserv_values, None)
+        if current != name:
+            batcher.add(key)
+
+    prserv_values.close()
+
+    if deferred:
+        linked = find_existing_prserv_values(county_id, deferred)
+        for name, keys in deferred.items():
+            if name not in linked:
+                for key in keys:
+                    batcher.add(key)
+
+    batcher.flush()
+    action = 'would be deleted' if dry_run else 'unlinked and deleted'
+    print(f"Scanned {scanned} keys; {batcher.total} files {action}.")
+
+
 def delete_s3_files(s3_client, keys_to_delete, dry_run=True):
     if not keys_to_delete:
         print("No files to delete.")
@@ -75,14 +334,18 @@ def delete_s3_files(s3_client, keys_to_delete, dry_run=True):
         except ClientError as e:
             print(f"Error deleting files: {e}")
 
-def main(county_id, s3_prefix, dry_run):
+def main(county_id, s3_prefix, dry_run, shard_depth=0, list_workers=16):
     print(f"Getting unique prserv values for countyID={county_id}...")
     prserv_values = get_unique_prserv_values_by_county(county_id)
     print(f"Found {len(prserv_values)} unique prserv values.")
 
     print(f"Listing all files in S3 bucket under prefix '{s3_prefix}'...")
-    s3_client = boto3.client('s3', region_name=AWS_REGION)
-    s3_files = list_s3_files(s3_client, s3_prefix)
+    s3_client = make_s3_client(list_workers)
+    if shard_depth:
+        low, high = prserv_bounds(county_id)
+        s3_files = set(iter_s3_keys_sharded(s3_client, s3_prefix, shard_depth, list_workers, low, high))
+    else:
+        s3_files = list_s3_files(s3_client, s3_prefix)
     print(f"Found {len(s3_files)} files in S3 bucket under prefix.")
 
     s3_filenames = {
@@ -106,7 +369,15 @@ if __name__ == "__main__":
     parser.add_argument("--county", type=int, required=True, help="County ID to filter prserv values")
     parser.add_argument("--prefix", type=str, required=True, help="S3 prefix (folder) to check in the bucket")
     parser.add_argument("--dry-run", action="store_true", help="Run without deleting, just list files that would be deleted")
+    parser.add_argument("--stream", action="store_true", help="Constant-memory merge-join of sorted PRSERVs and S3 keys")
+    parser.add_argument("--shard-depth", type=int, default=0, choices=[0, 1, 2],
+                        help="List up to 36**depth key ranges in parallel, split where the county's "
+                             "PRSERVs differ (0 = one serial listing)")
+    parser.add_argument("--list-workers", type=int, default=16, help="Parallel listing requests when sharding")
 
     args = parser.parse_args()
 
-    main(args.county, args.prefix, args.dry_run)
\ No newline at end of file
+    if args.stream:
+        stream_unlinked(args.county, args.prefix, args.dry_run, args.shard_depth, args.list_workers)
+    else:
+        main(args.county, args.prefix, args.dry_run, args.shard_depth, args.list_workers)
\ No newline at end of file
@@ -0,0 +1,71 @@
+from operator import itemgetter
+
+
+class FixedWidthLayout:
+    """
+    Compiled fixed-width line layout.
+
+    Built once from a list of (column_name, width) tuples; a width of None
+    takes the rest of the line and ends the layout. All columns are cut from
+    a line by a single itemgetter call over precomputed slices.
+    """
+
+    def __init__(self, columns):
+        names = []
+        slices = []
+        pos = 0
+        for name, width in columns:
+            names.append(name)
+            if width is None:
+                slices.append(slice(pos, None))
+                break
+            slices.append(slice(pos, pos + width))
+            pos += width
+
+        self.names = tuple(names)
+        self.width = pos
+        getter = itemgetter(*slices)
+        self._cut = getter if len(slices) > 1 else (lambda line: (getter(line),))
+
+    def split(self, line):
+        """Returns the stripped column values of line as a list."""
+        return [value.strip() for value in self._cut(line)]
+
+    def parse(self, line):
+        """Returns line as a dict keyed by column name."""
+        return dict(zip(self.names, self.split(line)))
+
+    def iter_file(self, file_path, encoding='utf-8'):
+        """Yields one parsed dict per line of file_path."""
+        with open(file_path, 'r', encoding=encoding) as f:
+            for line in f:
+                yield self.parse(line)
+
+
+LAYOUTS = {}
+
+
+def register_layout(name, columns):
+    layout = FixedWidthLayout(columns)
+    LAYOUTS[name] = layout
+    return layout
+
+
+def get_layout(name):
+    try:
+        return LAYOUTS[name]
+    except KeyError:
+        raise KeyError(f"Unknown fixed-width layout '{name}'. Registered: {sorted(LAYOUTS)}") from None
+
+
+# Washington County INDEX1.TXT
+register_layout('washington_index1', [
+    ('FileName', 30),
+    ('Grantor', 40),
+    ('Grantee', 40),
+    ('instrumentType', 22),
+    ('fileStampDate', 22),
+    ('fileDate', 8),
+    ('legalDescription', 42),
+    ('filename', None),
+])
@@ -1,6 +1,11 @@
 import os
+import sys
+import hashlib
 import pymysql
 from tqdm import tqdm
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from db_pool import BULK_LOAD_SESSION, ConnectionPool
+from metrics import ACTIVE_WORKERS, DB_STATEMENT_SECONDS, QUEUE_DEPTH, ROWS_INSERTED, start_exporter
 
 # Configurable toggles:
 LOAD_MODE = 'all'  # Options: 'one', 'skip_first', 'all'
@@ -18,9 +23,21 @@ DB_CONFIG = {
     'database': '',
     'local_infile': True,
     'cursorclass': pymysql.cursors.DictCursor,
-    'autocommit': True
+    'autocommit': False
 }
 
+# Files loaded in parallel, each on its own connection (main() sizes the pool
+# to match). Loads are recorded in ETL_Load_Ledger (etl_load_ledger.sql) and
+# skipped on rerun.
+LOAD_WORKERS = 4
+
+# Metrics snapshot ('.json' for JSON, otherwise Prometheus text; None = off),
+# rewritten every METRICS_INTERVAL seconds and at exit
+METRICS_PATH = None
+METRICS_INTERVAL = 15
+
+db_pool = None
+
 def load_prime_file_into_table(cursor, file_path, table_name):
     sql = f"""
     LOAD DATA LOCAL INFILE '{file_path}'
@@ -65,10 +82,8 @@ def load_prime_file_into_table(cursor, file_path, table_name):
       Filing_Date = STR_TO_DATE(@Filing_Date, '%Y-%m-%d'),
       Instrument_Date = STR_TO_DATE(@Instrument_Date, '%Y-%m-%d');
     """
-    try:
-        cursor.execute(sql)
-    except Exception as e:
-        print(f"Error loading file {file_path} into table {table_name}: {e}")
+    cursor.execute(sql)
+    return cursor.rowcount
 
 
 def load_multi_file_into_table(cursor, file_path, table_name):
@@ -96,10 +111,8 @@ def load_multi_file_into_table(cursor, file_path, table_name):
     SET
       Acres = NULLIF(@Acres, '');
     """
-    try:
-        cursor.execute(sql)
-    except Exception as e:
-        print(f"Error loading file {file_path} into table {table_name}: {e}")
+    cursor.execute(sql)
+    return cursor.rowcount
 
 
 def filter_files(files):
@@ -116,10 +129,87 @@ def filter_files(files):
         print(f"Unknown LOAD_MODE '{LOAD_MODE}', defaulting to one file.")
         return [files[0]]
 
-def main():
-    connection = pymysql.connect(**DB_CONFIG)
-    cursor = connection.cursor()
+def hash_file(file_path, chunk_size=8 * 1024 * 1024):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def is_loaded(cursor, table_name, file_hash):
+    cursor.execute("""
+        SELECT 1 FROM ETL_Load_Ledger
+        WHERE tableName = %s AND fileHash = %s AND status = 'loaded'
+    """, (table_name, file_hash))
+    return cursor.fetchone() is not None
+
+def record_load(cursor, table_name, file_path, file_size, file_hash, status,
+                rows_loaded=None, warnings=None, error=None):
+    cursor.execute("""
+        INSERT INTO ETL_Load_Ledger
+        (tableName, filePath, fileSize, fileHash, rowsLoaded, warnings, status, error)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+          filePath = VALUES(filePath), rowsLoaded = VALUES(rowsLoaded),
+          warnings = VALUES(warnings), status = VALUES(status), error = VALUES(error)
+    """, (table_name, file_path, file_size, file_hash, rows_loaded, warnings, status, error))
+
+def load_file(load_func, file_path, table_name):
+    """
+    Loads one file unless the ledger already has it. The LOAD DATA and its
+    ledger row commit together, so a crash never leaves a file half-recorded.
+    Returns (status, rows_loaded, warnings).
+    """
+    file_size = os.path.getsize(file_path)
+    file_hash = hash_file(file_path)
+
+    with db_pool.connection() as connection, connection.cursor() as cursor, ACTIVE_WORKERS.track(pool='loads'):
+        if is_loaded(cursor, table_name, file_hash):
+            return 'skipped', 0, 0
+
+        try:
+            with DB_STATEMENT_SECONDS.time(statement=f'load_data:{table_name}'):
+                rows_loaded = load_func(cursor, file_path, table_name)
+            cursor.execute("SHOW COUNT(*) WARNINGS")
+            warnings = list(cursor.fetchone().values())[0]
+            record_load(cursor, table_name, file_path, file_size, file_hash, 'loaded', rows_loaded, warnings)
+            connection.commit()
+            ROWS_INSERTED.inc(rows_loaded, table=table_name)
+            return 'loaded', rows_loaded, warnings
+        except pymysql.MySQLError as e:
+            connection.rollback()
+            record_load(cursor, table_name, file_path, file_size, file_hash, 'failed', error=str(e))
+            connection.commit()
+            raise
+
+def load_files(load_func, files, table_name, label):
+    totals = {'loaded': 0, 'skipped': 0, 'failed': 0, 'rows': 0, 'warnings': 0}
+    with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as executor:
+        futures = {executor.submit(load_file, load_func, f, table_name): f for f in files}
+        QUEUE_DEPTH.set(len(futures), queue='load_files')
+        for future in tqdm(as_completed(futures), total=len(futures), desc=label):
+            QUEUE_DEPTH.dec(queue='load_files')
+            file_path = futures[future]
+            try:
+                status, rows_loaded, warnings = future.result()
+            except Exception as e:
+                tqdm.write(f"Error loading file {file_path} into table {table_name}: {e}")
+                totals['failed'] += 1
+                continue
+            totals[status] += 1
+            totals['rows'] += rows_loaded
+            totals['warnings'] += warnings
+            if warnings:
+                tqdm.write(f"{os.path.basename(file_path)}: {rows_loaded} rows, {warnings} warnings")
+
+    print(f"{label}: {totals['loaded']} loaded ({totals['rows']} rows, {totals['warnings']} warnings), "
+          f"{totals['skipped']} already in ledger, {totals['failed']} failed")
+    return totals
 
+def main():
+    global db_pool
+    db_pool = ConnectionPool(DB_CONFIG, size=LOAD_WORKERS, session=BULK_LOAD_SESSION)
+    start_exporter(METRICS_PATH, 'loadFilesToDB', METRICS_INTERVAL)
     prime_files = sorted([os.path.join(PRIME_DIR, f) for f in os.listdir(PRIME_DIR) if f.endswith('_fixed.txt')])
     multi_files = sorted([os.path.join(MULTI_DIR, f) for f in os.listdir(MULTI_DIR) if f.endswith('_fixed.txt')])
 
@@ -127,15 +217,16 @@ def main():
     multi_files_to_load = filter_files(multi_files)
 
     print(f"Prime files to load ({len(prime_files_to_load)})")
-    for file in tqdm(prime_files_to_load):
-        load_prime_file_into_table(cursor, file, PRIME_TABLE)
+    prime = load_files(load_prime_file_into_table, prime_files_to_load, PRIME_TABLE, "Prime files")
 
     print(f"Multi files to load ({len(multi_files_to_load)})")
-    for file in tqdm(multi_files_to_load):
-        load_multi_file_into_table(cursor, file, MULTI_TABLE)
+    multi = load_files(load_multi_file_into_table, multi_files_to_load, MULTI_TABLE, "Multi files")
 
-    cursor.close()
-    connection.close()
+    db_pool.close()
+    failed = prime['failed'] + multi['failed']
+    if failed:
+        print(f"Loading finished with {failed} failed files (rerun to retry them).")
+        sys.exit(1)
     print("Loading complete.")
 
 if __name__ == '__main__':
@@ -0,0 +1,253 @@
+import atexit
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds (seconds) for statement and request latency histograms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Metric:
+    """
+    Base for a named metric with optional labels.
+
+    Values are kept per label combination; every method takes the labels as
+    keyword arguments (e.g. ROWS_INSERTED.inc(500, table='Document')).
+    """
+
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def samples(self):
+        """[(labels_dict, value)] for the snapshot."""
+        with self._lock:
+            items = list(self._values.items())
+        return [(dict(zip(self.labelnames, key)), self._copy(value)) for key, value in items]
+
+    def _copy(self, value):
+        return value
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        """Counts the block as in progress while it runs (e.g. active workers)."""
+        self.inc(1, **labels)
+        try:
+            yield
+        finally:
+            self.dec(1, **labels)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            state['counts'][bisect_left(self.buckets, value)] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the wall-clock duration of the block, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _copy(self, value):
+        return {'counts': list(value['counts']), 'sum': value['sum'], 'count': value['count']}
+
+
+class Registry:
+    """Named metrics shared by every module of one process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get_or_create(self, cls, name, help_text, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric '{name}' is already registered with a different type or labels")
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._get_or_create(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def to_json(self, job):
+        """Snapshot as a JSON-serializable dict."""
+        snapshot = {'job': job, 'time': time.time(), 'metrics': {}}
+        for metric in self.metrics():
+            entry = {'type': metric.kind, 'help': metric.help, 'samples': []}
+            for labels, value in metric.samples():
+                if metric.kind == 'histogram':
+                    value = dict(value, buckets=[b if b != math.inf else '+Inf' for b in metric.buckets])
+                entry['samples'].append({'labels': labels, 'value': value})
+            snapshot['metrics'][metric.name] = entry
+        return snapshot
+
+    def to_prometheus(self, job):
+        """Snapshot in the Prometheus text exposition format (for node_exporter's textfile collector)."""
+        lines = []
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for labels, value in metric.samples():
+                labels = dict(job=job, **labels)
+                if metric.kind != 'histogram':
+                    lines.append(f"{metric.name}{_format_labels(labels)} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets, value['counts']):
+                    cumulative += count
+                    le = '+Inf' if bound == math.inf else repr(float(bound))
+                    lines.append(f"{metric.name}_bucket{_format_labels(dict(labels, le=le))} {cumulative}")
+                lines.append(f"{metric.name}_sum{_format_labels(labels)} {value['sum']}")
+                lines.append(f"{metric.name}_count{_format_labels(labels)} {value['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+REGISTRY = Registry()
+
+# Shared metrics; each script reports under its own job label
+ROWS_READ = REGISTRY.counter('titlehero_rows_read_total', 'Source rows read', ('table',))
+ROWS_CONVERTED = REGISTRY.counter('titlehero_rows_converted_total', 'Rows converted to insert tuples', ('table',))
+ROWS_INSERTED = REGISTRY.counter('titlehero_rows_inserted_total', 'Rows inserted or loaded', ('table',))
+ROWS_REJECTED = REGISTRY.counter('titlehero_rows_rejected_total', 'Rows dropped instead of inserted', ('table', 'reason'))
+VALUES_REJECTED = REGISTRY.counter('titlehero_values_rejected_total', 'Unparseable values stored as NULL', ('field',))
+DB_STATEMENT_SECONDS = REGISTRY.histogram('titlehero_db_statement_seconds', 'DB statement latency', ('statement',))
+S3_REQUEST_SECONDS = REGISTRY.histogram('titlehero_s3_request_seconds', 'S3 request latency', ('operation',))
+S3_BYTES = REGISTRY.counter('titlehero_s3_bytes_total', 'Bytes uploaded to S3')
+S3_ERRORS = REGISTRY.counter('titlehero_s3_errors_total', 'Failed S3 requests', ('operation', 'kind'))
+QUEUE_DEPTH = REGISTRY.gauge('titlehero_queue_depth', 'Items waiting in a work queue', ('queue',))
+ACTIVE_WORKERS = REGISTRY.gauge('titlehero_active_workers', 'Workers currently busy', ('pool',))
+
+
+class MetricsExporter:
+    """
+    Writes REGISTRY to `path` every `interval` seconds and once more at exit.
+
+    A '.json' path gets a JSON snapshot, anything else the Prometheus text
+    format. '{job}' in path is replaced by the job name so scripts sharing a
+    setting write separate files. Files are replaced atomically.
+    """
+
+    def __init__(self, path, job, interval=15.0, registry=REGISTRY):
+        self.path = path.format(job=job)
+        self.job = job
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='metrics-exporter', daemon=True)
+
+    def start(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def write(self):
+        if self.path.endswith('.json'):
+            content = json.dumps(self.registry.to_json(self.job), indent=2)
+        else:
+            content = self.registry.to_prometheus(self.job)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, self.path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print(f"Could not write metrics to {self.path}: {e}")
+
+    def stop(self):
+        """Stops the periodic writes and writes the final snapshot."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self.write()
+
+
+def start_exporter(path, job, interval=15.0):
+    """Starts a MetricsExporter unless path is None; returns it (or None)."""
+    if not path:
+        return None
+    return MetricsExporter(path, job, interval).start()
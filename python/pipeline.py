@@ -0,0 +1,268 @@
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+
+# Per-stage completion is recorded here; a rerun skips stages marked done
+STATE_PATH = 'pipeline_state.json'
+# Stages with all inputs ready run side by side, up to MAX_PARALLEL at once
+MAX_PARALLEL = 4
+
+# --config replaces editing constants in each script, e.g.
+#   {"common":   {"COUNTY_ID": 3, "DB_CONFIG": {"host": "..."}},
+#    "settings": {"tif_to_s3": {"BASE_DIR": "...", "DEST_PREFIX": "Washington/"}},
+#    "args":     {"countFiles": ["--raw"]}}
+
+
+class Stage:
+    """
+    One pipeline step: runs `module`.main() in its own process.
+
+    inputs/outputs are artifact names; a stage starts once every stage that
+    outputs one of its inputs is done. Inputs no stage produces (raw exports,
+    image folders) are expected to exist already.
+    """
+
+    def __init__(self, name, module, inputs=(), outputs=()):
+        self.name = name
+        self.module = module
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+
+
+STAGES = [
+    Stage('preprocess', 'preprocessFiles', inputs=['raw_exports'], outputs=['fixed_files']),
+    Stage('count', 'countFiles', inputs=['fixed_files'], outputs=['row_counts']),
+    Stage('load_staging', 'loadFilesToDB', inputs=['fixed_files'], outputs=['staging_tables']),
+    Stage('abstracts', 'abstract_to_db', inputs=['abstract_list'], outputs=['abstract_table']),
+    Stage('documents', 'batchDocument', inputs=['staging_tables', 'abstract_table'], outputs=['document_table']),
+    Stage('parties', 'batchParty', inputs=['staging_tables', 'document_table'], outputs=['party_table']),
+    Stage('images', 'tif_to_s3', inputs=['image_folders'], outputs=['s3_images']),
+]
+
+
+def stage_dependencies(stages):
+    """Maps each stage name to the names of the stages producing its inputs."""
+    producers = {}
+    for stage in stages:
+        for output in stage.outputs:
+            if output in producers:
+                raise ValueError(f"Artifact '{output}' is produced by both {producers[output]} and {stage.name}")
+            producers[output] = stage.name
+    return {
+        stage.name: {producers[i] for i in stage.inputs if i in producers}
+        for stage in stages
+    }
+
+
+def downstream_of(stages, names):
+    """names plus every stage that depends on them, directly or not."""
+    deps = stage_dependencies(stages)
+    result = set(names)
+    changed = True
+    while changed:
+        changed = False
+        for stage, needs in deps.items():
+            if stage not in result and needs & result:
+                result.add(stage)
+                changed = True
+    return result
+
+
+class PipelineState:
+    """JSON file of {stage: {status, seconds, finished_at}}, rewritten atomically."""
+
+    def __init__(self, path):
+        self.path = path
+        self.stages = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.stages = json.load(f)
+
+    def is_done(self, name):
+        return self.stages.get(name, {}).get('status') == 'done'
+
+    def record(self, name, status, seconds):
+        self.stages[name] = {
+            'status': status,
+            'seconds': round(seconds, 3),
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        self.save()
+
+    def forget(self, names):
+        for name in names:
+            self.stages.pop(name, None)
+        self.save()
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.stages, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+# Stage scripts name their DB config either way; one spelling sets both
+DB_CONFIG_NAMES = ('DB_CONFIG', 'db_config')
+
+
+def setting_name(module, name):
+    """The module's own spelling of a DB config setting, else name unchanged."""
+    if name in DB_CONFIG_NAMES and not hasattr(module, name):
+        for alias in DB_CONFIG_NAMES:
+            if hasattr(module, alias):
+                return alias
+    return name
+
+
+def apply_settings(module, settings):
+    """
+    Sets module-level constants before main() runs. Stage scripts derive
+    pools, clients and paths from these inside main(), so an override takes
+    effect everywhere. A DB config override is merged into the module's
+    config (and into a pool created at import, which only connects on first
+    use). Names the module does not define are rejected rather than ignored.
+    """
+    settings = {setting_name(module, name): value for name, value in settings.items()}
+    unknown = sorted(name for name in settings if not hasattr(module, name))
+    if unknown:
+        raise ValueError(f"{module.__name__} has no setting(s) {', '.join(unknown)}")
+    for name, value in settings.items():
+        if name in ('DB_CONFIG', 'db_config'):
+            value = {**getattr(module, name), **value}
+            pool = getattr(module, 'db_pool', None)
+            if pool is not None:
+                pool.config.update(value)
+        setattr(module, name, value)
+
+
+def run_stage_process(module_name, config):
+    """
+    Child process entry point for one stage. 'common' settings apply where
+    the module defines them (DB_CONFIG also reaching a module's db_config);
+    its own 'settings' and 'args' come on top.
+    """
+    module = importlib.import_module(module_name)
+    settings = {setting_name(module, k): v for k, v in config.get('common', {}).items()
+                if hasattr(module, setting_name(module, k))}
+    settings.update(config.get('settings', {}).get(module_name, {}))
+    apply_settings(module, settings)
+    sys.argv = [f"{module_name}.py"] + list(config.get('args', {}).get(module_name, []))
+    module.main()
+
+
+def run_stage(stage, config):
+    """Runs stage in a fresh process; returns (ok, seconds)."""
+    ctx = multiprocessing.get_context('spawn')
+    process = ctx.Process(target=run_stage_process, args=(stage.module, config), name=f"stage-{stage.name}")
+    start = time.perf_counter()
+    process.start()
+    process.join()
+    return process.exitcode == 0, time.perf_counter() - start
+
+
+def run_pipeline(stages, state, config, max_parallel=MAX_PARALLEL):
+    """
+    Runs every stage not already done in state, each as soon as the stages
+    it depends on are done. A failed stage blocks its dependents only.
+    Returns {stage: (status, start_offset, seconds)} for the breakdown.
+    """
+    deps = stage_dependencies(stages)
+    by_name = {stage.name: stage for stage in stages}
+    pending = {name for name in by_name if not state.is_done(name)}
+    results = {name: ('skipped', 0.0, 0.0) for name in by_name if name not in pending}
+    pipeline_start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+        running = {}
+        while pending or running:
+            blocked_any = False
+            for name in sorted(pending):
+                if len(running) >= max_parallel:
+                    break
+                needs = deps[name]
+                if any(results.get(n, ('',))[0] in ('failed', 'blocked') for n in needs):
+                    pending.discard(name)
+                    results[name] = ('blocked', 0.0, 0.0)
+                    print(f"[{name}] blocked by a failed dependency")
+                    blocked_any = True
+                elif all(state.is_done(n) for n in needs):
+                    pending.discard(name)
+                    offset = time.perf_counter() - pipeline_start
+                    print(f"[{name}] starting {by_name[name].module}")
+                    running[executor.submit(run_stage, by_name[name], config)] = (name, offset)
+
+            if not running:
+                if blocked_any:
+                    continue
+                # Nothing could start: the remaining stages wait on each other
+                for name in pending:
+                    results[name] = ('blocked', 0.0, 0.0)
+                    print(f"[{name}] blocked by a dependency cycle")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, offset = running.pop(future)
+                try:
+                    ok, seconds = future.result()
+                except Exception as e:
+                    print(f"[{name}] could not start: {e}")
+                    ok, seconds = False, 0.0
+                status = 'done' if ok else 'failed'
+                state.record(name, status, seconds)
+                results[name] = (status, offset, seconds)
+                print(f"[{name}] {status} in {seconds:.1f}s")
+
+    return results
+
+
+def print_breakdown(stages, results, wall_seconds):
+    print(f"\n{'stage':<14} {'status':<8} {'start':>9} {'seconds':>9}")
+    for stage in stages:
+        status, offset, seconds = results[stage.name]
+        print(f"{stage.name:<14} {status:<8} {offset:>8.1f}s {seconds:>8.1f}s")
+    busy = sum(seconds for _, _, seconds in results.values())
+    print(f"Wall clock {wall_seconds:.1f}s for {busy:.1f}s of stage time")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the county ingestion stages with resumable state.")
+    parser.add_argument("--config", help="JSON file with 'common', 'settings' and 'args' for the stage modules")
+    parser.add_argument("--state", default=STATE_PATH, help="Stage state file")
+    parser.add_argument("--max-parallel", type=int, default=MAX_PARALLEL, help="Stages run at once")
+    parser.add_argument("--rerun", action="append", default=[], metavar="STAGE",
+                        help="Run STAGE and everything downstream of it again (repeatable)")
+    parser.add_argument("--reset", action="store_true", help="Forget all recorded progress")
+    args = parser.parse_args()
+
+    config = {}
+    if args.config:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+    state = PipelineState(args.state)
+    names = {stage.name for stage in STAGES}
+    unknown = set(args.rerun) - names
+    if unknown:
+        parser.error(f"Unknown stage(s): {', '.join(sorted(unknown))}. Stages: {', '.join(sorted(names))}")
+    if args.reset:
+        state.forget(names)
+    elif args.rerun:
+        state.forget(downstream_of(STAGES, args.rerun))
+
+    start = time.perf_counter()
+    results = run_pipeline(STAGES, state, config, args.max_parallel)
+    print_breakdown(STAGES, results, time.perf_counter() - start)
+
+    if any(status in ('failed', 'blocked') for status, _, _ in results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,27 @@
 import os
+import sys
 import glob
 import re
 from tqdm import tqdm
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 BASE_DIR = ''
 FOLDER_PATTERN = 'BLURC'
 
-TARGET_DIR = ''
-PRIME_TARGET = os.path.join(TARGET_DIR, 'prime')
-MULTI_TARGET = os.path.join(TARGET_DIR, 'multi')
+# Files are rewritten CHUNK_CHARS characters at a time across PREPROCESS_WORKERS processes
+CHUNK_CHARS = 4 * 1024 * 1024
+PREPROCESS_WORKERS = os.cpu_count()
+EOR = '{EOR}'
 
-os.makedirs(PRIME_TARGET, exist_ok=True)
-os.makedirs(MULTI_TARGET, exist_ok=True)
+# Fixed files go to <TARGET_DIR>/prime and <TARGET_DIR>/multi
+TARGET_DIR = ''
 
-def extract_folder_name(path):
+def extract_folder_name(path, folder_pattern=FOLDER_PATTERN):
     # Split path parts
     parts = path.split(os.sep)
 
     for part in parts:
-        if part.startswith(FOLDER_PATTERN):
+        if part.startswith(folder_pattern):
             return part
     return None
 
@@ -36,23 +39,62 @@ def find_blu_file_pairs(base_dir):
             print(f"No BLU folder in {folder}")
     return file_pairs
 
-def preprocess_and_save(file_path, output_dir):
-    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-        content = f.read()
-
-    fixed_content = content.replace('{EOR}', '').strip()
-
-    folder_name = extract_folder_name(file_path) or 'unknown'
+def partial_marker_length(text):
+    """Length of the longest suffix of text that could start an {EOR} marker."""
+    for length in range(min(len(EOR) - 1, len(text)), 0, -1):
+        if EOR.startswith(text[-length:]):
+            return length
+    return 0
+
+def strip_eor_stream(src, dst, chunk_chars=CHUNK_CHARS):
+    """
+    Streams src to dst removing {EOR} markers and leading/trailing
+    whitespace, equivalent to `content.replace('{EOR}', '').strip()` but
+    holding only one chunk in memory. A marker split across chunks is
+    carried into the next one; trailing whitespace is held back until more
+    text follows it.
+    """
+    carry = ''
+    pending_ws = ''
+    started = False
+
+    while True:
+        chunk = src.read(chunk_chars)
+        eof = not chunk
+        text = carry + chunk
+        keep = 0 if eof else partial_marker_length(text)
+        carry = text[len(text) - keep:] if keep else ''
+        piece = text[:len(text) - keep].replace(EOR, '')
+
+        if not started:
+            piece = piece.lstrip()
+            started = bool(piece)
+        stripped = piece.rstrip()
+        if stripped:
+            dst.write(pending_ws)
+            dst.write(stripped)
+            pending_ws = piece[len(stripped):]
+        elif started:
+            pending_ws += piece
+
+        if eof:
+            return
+
+def preprocess_and_save(file_path, output_dir, folder_pattern=FOLDER_PATTERN, chunk_chars=CHUNK_CHARS):
+    # Settings come in as arguments: spawned workers re-import this module
+    # and would not see overrides made in the parent
+    folder_name = extract_folder_name(file_path, folder_pattern) or 'unknown'
 
     base_name = os.path.basename(file_path)
 
-    new_base_name = base_name.replace(FOLDER_PATTERN, folder_name).replace('.txt', '_fixed')
+    new_base_name = base_name.replace(folder_pattern, folder_name).replace('.txt', '_fixed')
     new_file_name = f"{new_base_name}.txt"
 
     output_path = os.path.join(output_dir, new_file_name)
 
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(fixed_content)
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as src, \
+            open(output_path, 'w', encoding='utf-8') as dst:
+        strip_eor_stream(src, dst, chunk_chars)
 
     return output_path
 
@@ -62,9 +104,30 @@ def main():
         print("No file pairs found.")
         return
 
-    for prime_file, multi_file in tqdm(pairs, desc=f"Processing files"):
-        preprocess_and_save(prime_file, PRIME_TARGET)
-        preprocess_and_save(multi_file, MULTI_TARGET)
+    prime_target = os.path.join(TARGET_DIR, 'prime')
+    multi_target = os.path.join(TARGET_DIR, 'multi')
+    os.makedirs(prime_target, exist_ok=True)
+    os.makedirs(multi_target, exist_ok=True)
+
+    # Every prime and multi file is an independent task for the process pool
+    failed = 0
+    with ProcessPoolExecutor(max_workers=PREPROCESS_WORKERS) as executor:
+        futures = {}
+        for prime_file, multi_file in pairs:
+            for file_path, target in ((prime_file, prime_target), (multi_file, multi_target)):
+                future = executor.submit(preprocess_and_save, file_path, target, FOLDER_PATTERN, CHUNK_CHARS)
+                futures[future] = file_path
+
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Processing files"):
+            try:
+                future.result()
+            except Exception as e:
+                failed += 1
+                tqdm.write(f"Error preprocessing {futures[future]}: {e}")
+
+    if failed:
+        print(f"{failed} of {len(futures)} files failed")
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()
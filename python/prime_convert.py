@@ -0,0 +1,62 @@
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+
+# Document columns produced by convert_prime_batch, in insert order
+DOCUMENT_COLUMNS = (
+    'PRSERV', 'book', 'page', 'clerkNumber', 'instrumentType', 'acres', 'abstractCode',
+    'subBlock', 'legalDescription', 'instrumentDate', 'filingDate', 'remarks', 'GFNNumber',
+)
+ABSTRACT_CODE_INDEX = DOCUMENT_COLUMNS.index('abstractCode')
+
+
+@lru_cache(maxsize=100_000)
+def parse_date(value):
+    """Parses the date part of 'YYYY-MM-DD[ ...]'. Cached: exports repeat dates heavily."""
+    return datetime.strptime(value.split()[0], '%Y-%m-%d')
+
+
+def _convert(value, parser, field, rejected):
+    if not value or not value.strip():
+        return None
+    try:
+        return parser(value)
+    except (ValueError, IndexError):
+        rejected[field] += 1
+        return None
+
+
+def convert_prime_batch(records, headers):
+    """
+    Converts a batch of raw prime records into Document row tuples.
+
+    Runs in a worker process. Returns (rows, rejected) where rows follow
+    DOCUMENT_COLUMNS and rejected counts unparseable values per source field.
+    """
+    rows = []
+    rejected = Counter()
+
+    for record in records:
+        if not record.strip():
+            continue
+
+        fields = record.rstrip('\n').split('\t')
+        data = dict(zip(headers, fields))
+
+        rows.append((
+            data.get('PRSERV'),
+            data.get('Book'),
+            data.get('Page'),
+            data.get('Clerk_Number'),
+            data.get('Instrument_Type'),
+            _convert(data.get('Acres'), float, 'Acres', rejected),
+            data.get('Abstract'),
+            data.get('Sub_Block_Lot'),
+            data.get('Brief_Legal'),
+            _convert(data.get('Instrument_Date'), parse_date, 'Instrument_Date', rejected),
+            _convert(data.get('Filing_Date'), parse_date, 'Filing_Date', rejected),
+            data.get('Remarks'),
+            _convert(data.get('GF_Number'), int, 'GF_Number', rejected),
+        ))
+
+    return rows, rejected
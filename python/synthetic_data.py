@@ -0,0 +1,238 @@
+import argparse
+import os
+import random
+
+from preprocessFiles import strip_eor_stream
+
+# Column order of the BLU exports, as loadFilesToDB loads them
+PRIME_HEADERS = [
+    'PRSTAT', 'PRDOC', 'PRSERV', 'PRTYPE', 'PRMNAME', 'PRFOLDER', 'PRQUEUE', 'Clerk_Number',
+    'Book', 'Volume', 'Page', 'Grantor', 'Grantee', 'Instrument_Type', 'Remarks', 'Lien_Amount',
+    'Legal_Description', 'Sub_Block_Lot', 'Abst_Svy', 'Acres', 'Appr_Dist_ID', 'GIS',
+    'Instrument_Date', 'Filing_Date', 'Prior_Reference', 'Title_Co', 'GF_Number', 'Finalized_By',
+    'Export_Flag',
+]
+MULTI_HEADERS = [
+    'PRSERV', 'Number', 'Grantor', 'Grantee', 'Legal_Description', 'Sub_Block_Lot', 'Abst_Svy',
+    'Acres', 'Appr_Dist_ID', 'GIS', 'Prior_Reference', 'FullTextKey',
+]
+
+INSTRUMENT_TYPES = ['WARRANTY DEED', 'DEED OF TRUST', 'RELEASE', 'ASSIGNMENT', 'EASEMENT', 'AFFIDAVIT']
+SURNAMES = ['SMITH', 'JOHNSON', 'WILLIAMS', 'BROWN', 'JONES', 'GARCIA', 'MILLER', 'DAVIS',
+            'RODRIGUEZ', 'MARTINEZ', 'HERNANDEZ', 'LOPEZ', 'WILSON', 'ANDERSON', 'THOMAS']
+GIVEN_NAMES = ['JAMES', 'MARY', 'ROBERT', 'PATRICIA', 'JOHN', 'JENNIFER', 'MICHAEL', 'LINDA',
+               'DAVID', 'ELIZABETH', 'WILLIAM', 'BARBARA']
+
+EOR = '{EOR}'
+
+
+def prserv_for(n):
+    """Base36, zero-padded to 9 characters like uploadDocuments.base36_encode."""
+    chars = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    result = ''
+    while n > 0:
+        n, i = divmod(n, 36)
+        result = chars[i] + result
+    return result.zfill(9)
+
+
+def random_name(rng):
+    return f"{rng.choice(SURNAMES)} {rng.choice(GIVEN_NAMES)}"
+
+
+def random_date(rng):
+    return f"{rng.randint(1950, 2020)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+
+def prime_row(rng, n, abstracts):
+    values = {
+        'PRSTAT': 'A',
+        'PRDOC': str(n),
+        'PRSERV': prserv_for(n),
+        'PRTYPE': 'D',
+        'PRMNAME': f"IMG{n:08d}.TIF",
+        'PRFOLDER': f"F{n // 1000:05d}",
+        'PRQUEUE': '',
+        'Clerk_Number': str(100000 + n),
+        'Book': str(rng.randint(1, 2000)),
+        'Volume': '',
+        'Page': str(rng.randint(1, 900)),
+        'Grantor': random_name(rng),
+        'Grantee': random_name(rng),
+        'Instrument_Type': rng.choice(INSTRUMENT_TYPES),
+        'Remarks': '' if rng.random() < 0.7 else f"SEE VOL {rng.randint(1, 900)}",
+        'Lien_Amount': '' if rng.random() < 0.8 else f"{rng.randint(1000, 900000)}.00",
+        'Legal_Description': f"LOT {rng.randint(1, 40)} BLK {rng.randint(1, 12)}",
+        'Sub_Block_Lot': f"{rng.randint(1, 12)}/{rng.randint(1, 40)}",
+        'Abst_Svy': str(rng.randint(1, abstracts)),
+        'Acres': '' if rng.random() < 0.5 else f"{rng.uniform(0.1, 640):.3f}",
+        'Appr_Dist_ID': str(rng.randint(10000, 99999)),
+        'GIS': '',
+        'Instrument_Date': random_date(rng),
+        'Filing_Date': random_date(rng),
+        'Prior_Reference': '',
+        'Title_Co': '',
+        'GF_Number': '' if rng.random() < 0.6 else str(rng.randint(1, 99999)),
+        'Finalized_By': 'SYS',
+        'Export_Flag': 'Y',
+    }
+    return [values[h] for h in PRIME_HEADERS]
+
+
+def multi_row(rng, n, number):
+    return [
+        prserv_for(n), str(number), random_name(rng), random_name(rng),
+        f"LOT {rng.randint(1, 40)} BLK {rng.randint(1, 12)}", '', '', '', '', '', '', '',
+    ]
+
+
+def pad_nuls(rng, fields, nul_rate):
+    """Pads a random field with NULs on nul_rate of the records, as raw exports do."""
+    if nul_rate and rng.random() < nul_rate:
+        i = rng.randrange(len(fields))
+        fields[i] += '\x00' * rng.randint(1, 8)
+    return fields
+
+
+def write_blu_pair(blu_dir, prefix, first_doc, prime_rows, multi_per_doc, abstracts, rng, nul_rate):
+    """
+    Writes <prefix>_prime.txt and <prefix>_multi.txt as raw exports: tab
+    separated, header first, every record terminated by "{EOR}\\n".
+    Returns the row count of each file.
+    """
+    os.makedirs(blu_dir, exist_ok=True)
+    multi_rows = 0
+    prime_path = os.path.join(blu_dir, f"{prefix}_prime.txt")
+    multi_path = os.path.join(blu_dir, f"{prefix}_multi.txt")
+    with open(prime_path, 'w', encoding='utf-8', newline='') as prime, \
+            open(multi_path, 'w', encoding='utf-8', newline='') as multi:
+        prime.write('\t'.join(PRIME_HEADERS) + EOR + '\n')
+        multi.write('\t'.join(MULTI_HEADERS) + EOR + '\n')
+        for n in range(first_doc, first_doc + prime_rows):
+            prime.write('\t'.join(pad_nuls(rng, prime_row(rng, n, abstracts), nul_rate)) + EOR + '\n')
+            for number in range(rng.randint(0, 2 * multi_per_doc)):
+                multi.write('\t'.join(pad_nuls(rng, multi_row(rng, n, number + 1), nul_rate)) + EOR + '\n')
+                multi_rows += 1
+    return prime_rows, multi_rows
+
+
+def write_fixed(raw_path, fixed_path):
+    """Writes the preprocessFiles output for raw_path."""
+    with open(raw_path, 'r', encoding='utf-8', errors='ignore') as src, \
+            open(fixed_path, 'w', encoding='utf-8') as dst:
+        strip_eor_stream(src, dst)
+
+
+def write_index1(file_path, lines, seed=0):
+    """Writes a washington_index1 fixed-width INDEX1 file."""
+    rng = random.Random(seed)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        for i in range(lines):
+            month, day, year = rng.randint(1, 12), rng.randint(1, 28), rng.randint(1950, 2020)
+            stamp = f"{'STAMP':<9}{month:02d}{day:02d}{year}{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}"
+            f.write(
+                f"{f'IMG{i:08d}.TIF':<30}"
+                f"{f'GRANTOR {i % 5000}':<40}"
+                f"{f'GRANTEE {i % 7000}':<40}"
+                f"{rng.choice(['WARRANTY DEED', 'DEED OF TRUST', 'RELEASE']):<22}"
+                f"{stamp:<22}"
+                f"{month:02d}{day:02d}{year}"
+                f"{f'LOT {i % 40} BLK {i % 12}':<42}"
+                f"IMAGES\\IMG{i:08d}.TIF\n"
+            )
+
+
+def write_index2(file_path, lines, parties_per_file=2, seed=0):
+    """Writes a pipe-delimited INDEX2 file with extra parties for write_index1's files."""
+    rng = random.Random(seed)
+    written = 0
+    with open(file_path, 'w', encoding='utf-8') as f:
+        for i in range(lines):
+            for _ in range(rng.randint(0, 2 * parties_per_file)):
+                f.write(f"IMAGES\\IMG{i:08d}.TIF|{i}|{random_name(rng)}|{random_name(rng)}\n")
+                written += 1
+    return written
+
+
+def write_abstract_list(file_path, count, seed=0):
+    """Writes an abstract list in the `<code><name>{EOR}` form abstract_to_db parses."""
+    rng = random.Random(seed)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        for code in range(1, count + 1):
+            f.write(f"{code}{rng.choice(SURNAMES)} {rng.choice(GIVEN_NAMES)} SURVEY{EOR}\n")
+    return count
+
+
+def generate(out_dir, folders=2, prime_rows=10000, multi_per_doc=2, index_lines=10000,
+             abstracts=500, nul_rate=0.01, folder_pattern='BLURC', seed=0):
+    """
+    Writes a synthetic county under out_dir:
+
+        <folder_pattern>NNNN/BLU/<folder_pattern>_{prime,multi}.txt   raw exports
+        prime/, multi/                                              preprocessed *_fixed.txt
+        INDEX/FNNNN/INDEX1.TXT, INDEX2.TXT                           image index files
+        abstracts.txt                                               abstract list
+
+    prime_rows and index_lines are per folder. Returns a dict of paths and
+    row counts for the benchmarks.
+    """
+    rng = random.Random(seed)
+    summary = {'prime_raw': [], 'multi_raw': [], 'prime_fixed': [], 'multi_fixed': [],
+               'index1': [], 'index2': [], 'prime_rows': 0, 'multi_rows': 0,
+               'index1_rows': 0, 'index2_rows': 0}
+
+    for kind in ('prime', 'multi'):
+        os.makedirs(os.path.join(out_dir, kind), exist_ok=True)
+
+    for i in range(folders):
+        folder = f"{folder_pattern}{i + 1:04d}"
+        blu_dir = os.path.join(out_dir, folder, 'BLU')
+        primes, multis = write_blu_pair(blu_dir, folder_pattern, i * prime_rows + 1, prime_rows,
+                                        multi_per_doc, abstracts, rng, nul_rate)
+        summary['prime_rows'] += primes
+        summary['multi_rows'] += multis
+
+        for kind in ('prime', 'multi'):
+            raw_path = os.path.join(blu_dir, f"{folder_pattern}_{kind}.txt")
+            fixed_path = os.path.join(out_dir, kind, f"{folder}_{kind}_fixed.txt")
+            write_fixed(raw_path, fixed_path)
+            summary[f'{kind}_raw'].append(raw_path)
+            summary[f'{kind}_fixed'].append(fixed_path)
+
+        index_dir = os.path.join(out_dir, 'INDEX', f"F{i + 1:04d}")
+        os.makedirs(index_dir, exist_ok=True)
+        index1_path = os.path.join(index_dir, 'INDEX1.TXT')
+        index2_path = os.path.join(index_dir, 'INDEX2.TXT')
+        write_index1(index1_path, index_lines, seed=seed + i)
+        summary['index2_rows'] += write_index2(index2_path, index_lines, seed=seed + i)
+        summary['index1_rows'] += index_lines
+        summary['index1'].append(index1_path)
+        summary['index2'].append(index2_path)
+
+    summary['abstracts'] = os.path.join(out_dir, 'abstracts.txt')
+    summary['abstract_rows'] = write_abstract_list(summary['abstracts'], abstracts, seed)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic county export for benchmarking the ETL scripts.")
+    parser.add_argument("out_dir", help="Directory to write into")
+    parser.add_argument("--folders", type=int, default=2, help="BLU folders / INDEX folders to write")
+    parser.add_argument("--prime-rows", type=int, default=10000, help="Prime rows per folder")
+    parser.add_argument("--multi-per-doc", type=int, default=2, help="Average multi rows per document")
+    parser.add_argument("--index-lines", type=int, default=10000, help="INDEX1 lines per folder")
+    parser.add_argument("--abstracts", type=int, default=500, help="Abstract list entries")
+    parser.add_argument("--nul-rate", type=float, default=0.01, help="Fraction of records padded with NULs")
+    parser.add_argument("--folder-pattern", default='BLURC', help="Export folder prefix (txt_to_db expects WASTP)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    summary = generate(args.out_dir, args.folders, args.prime_rows, args.multi_per_doc, args.index_lines,
+                       args.abstracts, args.nul_rate, args.folder_pattern, args.seed)
+    print(f"Wrote {summary['prime_rows']:,} prime, {summary['multi_rows']:,} multi, "
+          f"{summary['index1_rows']:,} INDEX1, {summary['index2_rows']:,} INDEX2 and "
+          f"{summary['abstract_rows']:,} abstract rows to {args.out_dir}")
+
+
+if __name__ == '__main__':
+    main()
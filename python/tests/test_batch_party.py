@@ -0,0 +1,67 @@
+import unittest
+
+try:
+    import batchParty
+except ImportError as e:  # pymysql / tqdm not installed
+    raise unittest.SkipTest(f"batchParty dependencies missing: {e}")
+
+from batchParty import PassState
+
+
+def make_state(lo=1, hi=100_000, resume_from=None):
+    return PassState('Multi_Staging', 'Grantor', 'Grantor', lo, hi, resume_from)
+
+
+class PassStateTest(unittest.TestCase):
+    def test_batch_size_scales_from_the_measured_range(self):
+        state = make_state()
+        start, end = state.take_range()
+        self.assertEqual(end - start + 1, batchParty.BATCH_SIZE)
+        state.take_range()
+        state.take_range()
+        # Three fast ranges finishing must not compound to 8x the range size
+        for start in sorted(state.outstanding):
+            state.finish_range(start, 0, batchParty.TARGET_SECONDS / 4)
+        self.assertEqual(state.batch_size, 2 * batchParty.BATCH_SIZE)
+
+    def test_steady_latency_keeps_batch_size(self):
+        state = make_state()
+        for _ in range(5):
+            start, end = state.take_range()
+            state.finish_range(start, 0, batchParty.TARGET_SECONDS)
+            self.assertEqual(state.batch_size, batchParty.BATCH_SIZE)
+
+    def test_batch_size_is_clamped(self):
+        state = make_state(hi=10_000_000)
+        for _ in range(20):
+            start, _ = state.take_range()
+            state.finish_range(start, 0, 0)
+        self.assertEqual(state.batch_size, batchParty.MAX_BATCH_SIZE)
+        for _ in range(20):
+            start, _ = state.take_range()
+            state.finish_range(start, 0, 1000)
+        self.assertEqual(state.batch_size, batchParty.MIN_BATCH_SIZE)
+
+    def test_high_water_only_advances_over_contiguous_ranges(self):
+        state = make_state()
+        first, _ = state.take_range()
+        second, second_end = state.take_range()
+        self.assertFalse(state.finish_range(second, 3, batchParty.TARGET_SECONDS))
+        self.assertEqual(state.high_water, 0)
+        self.assertTrue(state.finish_range(first, 2, batchParty.TARGET_SECONDS))
+        self.assertEqual(state.high_water, second_end)
+        self.assertEqual(state.inserted, 5)
+
+    def test_resume_and_done(self):
+        state = make_state(hi=7_000, resume_from=4_000)
+        start, end = state.take_range()
+        self.assertEqual((start, end), (4_001, 7_000))
+        self.assertFalse(state.has_more())
+        self.assertFalse(state.is_done())
+        state.finish_range(start, 0, 1)
+        self.assertTrue(state.is_done())
+        self.assertTrue(make_state(hi=7_000, resume_from=7_000).is_done())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import random
+import tempfile
+import unittest
+
+from cleanFile import clean_file
+
+
+def clean_in_memory(data):
+    """The original whole-file implementation: split, strip NULs, drop empties."""
+    out = b""
+    for record in data.split(b"{EOR}"):
+        cleaned = record.replace(b"\x00", b"")
+        if cleaned:
+            out += cleaned + b"\n"
+    return out
+
+
+class CleanFileTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def clean(self, data, chunk_size):
+        input_path = os.path.join(self.dir.name, 'in.txt')
+        output_path = os.path.join(self.dir.name, 'out.txt')
+        with open(input_path, 'wb') as f:
+            f.write(data)
+        bytes_in, bytes_out = clean_file(input_path, output_path, chunk_size)
+        with open(output_path, 'rb') as f:
+            cleaned = f.read()
+        self.assertEqual((bytes_in, bytes_out), (len(data), len(cleaned)))
+        return cleaned
+
+    def test_matches_whole_file_split(self):
+        rng = random.Random(20)
+        pieces = [b"{EOR}", b"\x00", b"\x00\x00", b"a", b"bc\td", b"{EO", b"R}", b"\r\n", b"\xe9"]
+        for _ in range(500):
+            data = b"".join(rng.choice(pieces) for _ in range(rng.randint(0, 60)))
+            for chunk_size in (1, 3, 5, 8, 64):
+                self.assertEqual(self.clean(data, chunk_size), clean_in_memory(data), (data, chunk_size))
+
+    def test_record_longer_than_the_buffer(self):
+        data = b"H1\tH2{EOR}" + b"x\x00" * 5000 + b"{EOR}\x00\x00{EOR}" + b"y" * 3000
+        self.assertEqual(self.clean(data, 64), clean_in_memory(data))
+
+    def test_long_nul_record_is_dropped(self):
+        data = b"a{EOR}" + b"\x00" * 1000 + b"{EOR}b"
+        self.assertEqual(self.clean(data, 16), b"a\nb\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
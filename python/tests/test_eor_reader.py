@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+
+from eor_reader import iter_records, read_header, shard_ranges
+
+
+class EorReaderTest(unittest.TestCase):
+    def write(self, data):
+        fd, path = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def read_all(self, path):
+        headers, data_start = read_header(path)
+        return headers, list(iter_records(path, data_start))
+
+    def test_lf_export(self):
+        path = self.write(b"H1\tH2{EOR}\nA1\tB1{EOR}\nA2\tB2{EOR}\n")
+        self.assertEqual(self.read_all(path), (['H1', 'H2'], ['A1\tB1', 'A2\tB2']))
+
+    def test_crlf_export(self):
+        path = self.write(b"H1\tH2\r\n{EOR}\r\nA1\tB1{EOR}\r\nA2\tline\r\nbreak{EOR}\r\n")
+        self.assertEqual(self.read_all(path), (['H1', 'H2'], ['A1\tB1', 'A2\tline\nbreak']))
+
+    def test_matches_text_mode_split(self):
+        data = b"H1\tH2{EOR}\r\n\r\nA1\tB1{EOR}\r\n  {EOR}\rA2\tB2{EOR}"
+        path = self.write(data)
+        with open(path, 'r', encoding='utf-8') as f:
+            expected = [r.lstrip('\n') for r in f.read().split('{EOR}') if r.strip()]
+        headers, records = self.read_all(path)
+        self.assertEqual([headers] + records, [expected[0].split('\t')] + expected[1:])
+
+    def test_shards_cover_every_record(self):
+        path = self.write(b"H{EOR}\r\n" + b"".join(b"row%d{EOR}\r\n" % i for i in range(50)))
+        _, data_start = read_header(path)
+        records = [r for start, end in shard_ranges(path, 4, data_start) for r in iter_records(path, start, end)]
+        self.assertEqual(records, [f"row{i}" for i in range(50)])
+
+
+if __name__ == '__main__':
+    unittest.main()
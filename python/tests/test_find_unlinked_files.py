@@ -0,0 +1,171 @@
+import contextlib
+import random
+import unittest
+from unittest import mock
+
+try:
+    import findUnlinkedFiles
+except ImportError as e:  # boto3 / pymysql not installed
+    raise unittest.SkipTest(f"findUnlinkedFiles dependencies missing: {e}")
+
+from uploadDocuments import base36_encode
+
+PREFIX = 'Washington/'
+COUNTY = 3
+
+
+class FakeDB:
+    """Document(PRSERV, countyID) rows behind the db_pool interface the module uses."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.borrowed = 0
+
+    @contextlib.contextmanager
+    def connection(self):
+        self.borrowed += 1
+        try:
+            yield self
+        finally:
+            self.borrowed -= 1
+
+    def cursor(self, cursorclass=None):
+        return FakeCursor(self)
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, args):
+        county = args[0]
+        values = [p for p, c in self.db.rows if c == county and p is not None]
+        if 'MIN(' in query:
+            encoded = [p.encode() for p in values]
+            self.result = [(min(encoded), max(encoded)) if encoded else (None, None)]
+        elif 'LIMIT' in query:
+            _, last, _, limit = args
+            values = sorted((p for p in values if last is None or p.encode() > last.encode()),
+                            key=str.encode)
+            self.result = [(p,) for p in values[:limit]]
+        else:
+            wanted = set(args[1:])
+            self.result = [(p,) for p in set(values) if p in wanted]
+
+    def fetchall(self):
+        return self.result
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+
+class FakeS3:
+    """Sorted listing with StartAfter and pagination, plus delete_objects."""
+
+    def __init__(self, keys, db, page_size=3):
+        self.keys = sorted(keys, key=str.encode)
+        self.db = db
+        self.page_size = page_size
+        self.deleted = []
+        self.listed_from = []
+
+    def get_paginator(self, name):
+        return self
+
+    def paginate(self, Bucket, Prefix, StartAfter=None):
+        self.listed_from.append(StartAfter)
+        keys = [k for k in self.keys if k.startswith(Prefix) and (StartAfter is None or k > StartAfter)]
+        for i in range(0, len(keys), self.page_size):
+            # The PRSERV stream must not hold a connection while S3 is read
+            assert self.db.borrowed == 0, "DB connection held during S3 listing"
+            yield {'Contents': [{'Key': k} for k in keys[i:i + self.page_size]]}
+
+    def delete_objects(self, Bucket, Delete):
+        keys = [obj['Key'] for obj in Delete['Objects']]
+        self.deleted.extend(keys)
+        return {'Deleted': [{'Key': k} for k in keys]}
+
+
+def set_difference(keys, rows):
+    """The non-streaming audit: keys whose name is not a PRSERV of the county."""
+    prservs = {p for p, c in rows if c == COUNTY and p is not None}
+    return {k for k in keys if k[len(PREFIX):].rsplit('.', 1)[0] not in prservs}
+
+
+class StreamUnlinkedTest(unittest.TestCase):
+    def run_stream(self, keys, rows, shard_depth=0):
+        db = FakeDB(rows)
+        s3 = FakeS3(keys, db)
+        with mock.patch.object(findUnlinkedFiles, 'db_pool', db), \
+                mock.patch.object(findUnlinkedFiles, 'make_s3_client', lambda workers: s3), \
+                mock.patch('builtins.print'):
+            findUnlinkedFiles.stream_unlinked(COUNTY, PREFIX, dry_run=False, shard_depth=shard_depth,
+                                              list_workers=4)
+        return s3
+
+    def random_case(self, seed):
+        rng = random.Random(seed)
+        ids = rng.sample(range(1, 3_000_000), 300)
+        rows = [(base36_encode(i), rng.choice([COUNTY, COUNTY, 7])) for i in ids]
+        rows += rows[:20]  # duplicate PRSERVs
+        keys = {f"{PREFIX}{base36_encode(i)}{rng.choice(['.tif', '.TIF', '.pdf'])}" for i in ids[:200]}
+        keys |= {f"{PREFIX}{base36_encode(i)}.tif" for i in rng.sample(range(1, 3_000_000), 100)}
+        keys |= {f"{PREFIX}{p}-C.tif" for p, _ in rows[:5]} | {f"{PREFIX}{p}a.tif" for p, _ in rows[5:10]}
+        return sorted(keys), rows
+
+    def test_matches_set_difference(self):
+        for seed in range(5):
+            keys, rows = self.random_case(seed)
+            s3 = self.run_stream(keys, rows)
+            self.assertEqual(sorted(s3.deleted), sorted(set_difference(keys, rows)))
+
+    def test_keyset_pages_cover_every_prserv(self):
+        rows = [(base36_encode(i), COUNTY) for i in (5, 5, 5, 36, 37, 1000, 1000, 99999)]
+        with mock.patch.object(findUnlinkedFiles, 'db_pool', FakeDB(rows)):
+            for page_size in (1, 2, 3, 100):
+                values = list(findUnlinkedFiles.iter_sorted_prserv_values(COUNTY, page_size))
+                self.assertEqual(values, sorted({p for p, _ in rows}))
+
+    def test_sharded_stream_matches_set_difference(self):
+        for seed in range(3):
+            keys, rows = self.random_case(seed)
+            for depth in (1, 2):
+                s3 = self.run_stream(keys, rows, shard_depth=depth)
+                self.assertEqual(sorted(s3.deleted), sorted(set_difference(keys, rows)))
+
+    def test_shards_split_where_padded_prservs_differ(self):
+        keys, rows = self.random_case(0)
+        low, high = min(p for p, _ in rows), max(p for p, _ in rows)
+        boundaries = findUnlinkedFiles.shard_boundaries(PREFIX, 1, low, high)
+        # base36_encode pads to 9 characters, so the leading zeros are shared
+        self.assertTrue(all(b.startswith(PREFIX + '000') for b in boundaries))
+        self.assertGreater(len(boundaries), 1)
+        bounds = [None] + boundaries + [None]
+        sizes = [sum(1 for k in keys if (a is None or k > a) and (b is None or k <= b))
+                 for a, b in zip(bounds, bounds[1:])]
+        self.assertEqual(sum(sizes), len(keys))
+        self.assertLess(max(sizes), len(keys) / 2)
+
+    def test_sharded_listing_is_ordered_and_complete(self):
+        keys, rows = self.random_case(1)
+        s3 = FakeS3(keys, FakeDB(rows), page_size=2)
+        low, high = min(p for p, _ in rows), max(p for p, _ in rows)
+        listed = list(findUnlinkedFiles.iter_s3_keys_sharded(s3, PREFIX, 2, 4, low, high))
+        self.assertEqual(listed, s3.keys)
+        self.assertEqual(len(s3.listed_from), len(findUnlinkedFiles.shard_boundaries(PREFIX, 2, low, high)) + 1)
+
+    def test_nothing_deleted_when_every_key_is_linked(self):
+        rows = [(base36_encode(i), COUNTY) for i in range(1, 50)]
+        keys = [f"{PREFIX}{p}.tif" for p, _ in rows]
+        self.assertEqual(self.run_stream(keys, rows).deleted, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import sys
+import tempfile
+import types
+import unittest
+
+from pipeline import PipelineState, Stage, apply_settings, run_pipeline, run_stage, run_stage_process
+
+
+class ApplySettingsTest(unittest.TestCase):
+    def test_db_config_is_merged(self):
+        module = types.ModuleType('stage')
+        module.DB_CONFIG = {'host': '', 'database': 'titlehero', 'autocommit': False}
+        module.WORKERS = 4
+        apply_settings(module, {'DB_CONFIG': {'host': 'db.local'}, 'WORKERS': 16})
+        self.assertEqual(module.DB_CONFIG, {'host': 'db.local', 'database': 'titlehero', 'autocommit': False})
+        self.assertEqual(module.WORKERS, 16)
+
+    def test_db_config_reaches_either_spelling(self):
+        module = types.ModuleType('stage')
+        module.db_config = {'host': '', 'database': 'titlehero'}
+        apply_settings(module, {'DB_CONFIG': {'host': 'db.local'}})
+        self.assertEqual(module.db_config, {'host': 'db.local', 'database': 'titlehero'})
+        self.assertFalse(hasattr(module, 'DB_CONFIG'))
+
+    def test_unknown_setting_is_rejected(self):
+        module = types.ModuleType('stage')
+        module.WORKERS = 4
+        with self.assertRaises(ValueError):
+            apply_settings(module, {'WORKERS': 8, 'WORKRES': 8})
+        self.assertEqual(module.WORKERS, 4)
+
+
+STAGE_MODULE = '''
+import sys
+EXIT_CODE = 0
+db_config = {'host': '', 'database': 'titlehero'}
+def main():
+    sys.exit(EXIT_CODE)
+'''
+
+
+class RunPipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        with open(os.path.join(self.dir.name, 'pipeline_test_stage.py'), 'w', encoding='utf-8') as f:
+            f.write(STAGE_MODULE)
+        sys.path.insert(0, self.dir.name)
+        self.addCleanup(sys.path.remove, self.dir.name)
+
+    def test_exit_status_decides_done_or_failed(self):
+        stage = Stage('one', 'pipeline_test_stage')
+        self.assertTrue(run_stage(stage, {})[0])
+        failing = {'settings': {'pipeline_test_stage': {'EXIT_CODE': 1}}}
+        self.assertFalse(run_stage(stage, failing)[0])
+
+    def test_common_db_config_reaches_lowercase_db_config(self):
+        config = {'common': {'DB_CONFIG': {'host': 'db.local'}, 'COUNTY_ID': 3}}
+        argv = sys.argv
+        self.addCleanup(setattr, sys, 'argv', argv)
+        with self.assertRaises(SystemExit):
+            run_stage_process('pipeline_test_stage', config)
+        module = sys.modules.pop('pipeline_test_stage')
+        self.assertEqual(module.db_config, {'host': 'db.local', 'database': 'titlehero'})
+
+    def test_failed_stage_blocks_dependents(self):
+        stages = [
+            Stage('first', 'pipeline_test_stage', outputs=['a']),
+            Stage('second', 'pipeline_test_stage', inputs=['a']),
+        ]
+        state = PipelineState(os.path.join(self.dir.name, 'state.json'))
+        config = {'settings': {'pipeline_test_stage': {'EXIT_CODE': 2}}}
+        results = run_pipeline(stages, state, config, max_parallel=1)
+        self.assertEqual((results['first'][0], results['second'][0]), ('failed', 'blocked'))
+        self.assertFalse(state.is_done('first'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+try:
+    import tif_to_s3
+except ImportError as e:  # boto3 / tqdm not installed
+    raise unittest.SkipTest(f"tif_to_s3 dependencies missing: {e}")
+
+from metrics import QUEUE_DEPTH
+
+
+class FakeS3:
+    """In-memory stand-in for the boto3 S3 client calls tif_to_s3 makes."""
+
+    def __init__(self, fail=()):
+        self.objects = {}
+        self.fail = set(fail)
+        self._lock = threading.Lock()
+
+    def upload_file(self, file_path, bucket, key, Config=None):
+        if os.path.basename(file_path) in self.fail:
+            raise OSError(f"simulated failure for {file_path}")
+        with open(file_path, 'rb') as f:
+            body = f.read()
+        with self._lock:
+            self.objects[key] = body
+
+    def head_object(self, Bucket, Key):
+        return {'ETag': '"%s"' % hashlib.md5(self.objects[Key]).hexdigest()}
+
+
+class AdaptiveLimiterTest(unittest.TestCase):
+    def run_window(self, limiter, nbytes, throttled=False):
+        limiter.acquire()
+        limiter._window_start -= limiter.window
+        limiter.release(nbytes, throttled)
+
+    def test_initial_limit_is_clamped(self):
+        self.assertEqual(tif_to_s3.AdaptiveLimiter(100, 2, 10).limit, 10)
+        self.assertEqual(tif_to_s3.AdaptiveLimiter(1, 2, 10).limit, 2)
+
+    def test_grows_while_throughput_improves(self):
+        limiter = tif_to_s3.AdaptiveLimiter(8, 2, 12, window=1.0, step=4)
+        self.run_window(limiter, 100 * tif_to_s3.MB)
+        self.assertEqual(limiter.limit, 12)
+        self.run_window(limiter, 200 * tif_to_s3.MB)
+        self.assertEqual(limiter.limit, 12)
+
+    def test_halves_on_throttle_down_to_minimum(self):
+        limiter = tif_to_s3.AdaptiveLimiter(16, 5, 32, window=1.0)
+        self.run_window(limiter, 100 * tif_to_s3.MB, throttled=True)
+        self.assertEqual(limiter.limit, 8)
+        self.run_window(limiter, 100 * tif_to_s3.MB, throttled=True)
+        self.assertEqual(limiter.limit, 5)
+
+    def test_backs_off_when_throughput_drops(self):
+        limiter = tif_to_s3.AdaptiveLimiter(16, 2, 32, window=1.0, step=4)
+        self.run_window(limiter, 100 * tif_to_s3.MB)
+        self.assertEqual(limiter.limit, 20)
+        self.run_window(limiter, 1)
+        self.assertEqual(limiter.limit, 16)
+
+    def test_acquire_blocks_at_the_limit(self):
+        limiter = tif_to_s3.AdaptiveLimiter(1, 1, 1, window=60)
+        limiter.acquire()
+        acquired = threading.Event()
+        waiter = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+        waiter.start()
+        self.assertFalse(acquired.wait(0.1))
+        limiter.release(0)
+        self.assertTrue(acquired.wait(1))
+        waiter.join()
+
+
+class TransferConfigTest(unittest.TestCase):
+    MB = tif_to_s3.MB
+
+    def test_small_files_use_the_floor(self):
+        config = tif_to_s3.transfer_config_for([100_000] * 50)
+        self.assertEqual((config.multipart_threshold, config.multipart_chunksize), (8 * self.MB, 8 * self.MB))
+        self.assertFalse(config.use_threads)
+
+    def test_threshold_sits_above_p95(self):
+        sizes = [20 * self.MB + 1] * 95 + [500 * self.MB] * 5
+        self.assertEqual(tif_to_s3.transfer_config_for(sizes).multipart_threshold, 500 * self.MB)
+        sizes = [20 * self.MB + 1] * 99 + [500 * self.MB]
+        self.assertEqual(tif_to_s3.transfer_config_for(sizes).multipart_threshold, 21 * self.MB)
+
+    def test_chunks_fit_the_part_limit(self):
+        largest = 200_000 * self.MB
+        config = tif_to_s3.transfer_config_for([self.MB, largest])
+        self.assertLessEqual(-(-largest // config.multipart_chunksize), 10000)
+
+    def test_empty_folder(self):
+        self.assertFalse(tif_to_s3.transfer_config_for([]).use_threads)
+
+
+class UploadAllTest(unittest.TestCase):
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base)
+        self.folders = []
+        for folder, names in (('F1', ['a.tif', 'b.tif', 'notes.txt']), ('F2', ['a.tif', 'c.tif'])):
+            blu = os.path.join(self.base, folder, 'BLU', 'sub')
+            os.makedirs(blu)
+            for name in names:
+                with open(os.path.join(blu, name), 'wb') as f:
+                    f.write(name.encode() * 10)
+            self.folders.append(os.path.join(self.base, folder))
+
+    def upload(self, client, manifest=None):
+        with mock.patch.object(tif_to_s3, 's3_client', client), \
+                mock.patch.object(tif_to_s3, 'MAX_WORKERS', 4), \
+                mock.patch.object(tif_to_s3, 'DISCOVERY_AHEAD', 2):
+            return tif_to_s3.upload_all(self.folders, manifest, limiter=tif_to_s3.AdaptiveLimiter(2, 1, 4))
+
+    def queue_depth(self):
+        return dict((labels['queue'], value) for labels, value in QUEUE_DEPTH.samples()).get('s3_uploads', 0)
+
+    def test_uploads_every_file_and_skips_text(self):
+        client = FakeS3()
+        stats = self.upload(client)
+        self.assertEqual(sorted(client.objects), ['Washington/a.tif', 'Washington/b.tif', 'Washington/c.tif'])
+        self.assertEqual((stats['F1'].files, stats['F2'].files), (2, 2))
+        self.assertEqual(sum(s.failed for s in stats.values()), 0)
+        self.assertEqual(self.queue_depth(), 0)
+
+    def test_rerun_skips_manifest_entries(self):
+        manifest_path = os.path.join(self.base, 'manifest.jsonl')
+        manifest = tif_to_s3.UploadManifest(manifest_path)
+        self.upload(FakeS3(fail={'c.tif'}), manifest)
+        manifest.close()
+
+        client = FakeS3()
+        manifest = tif_to_s3.UploadManifest(manifest_path)
+        self.addCleanup(manifest.close)
+        stats = self.upload(client, manifest)
+        self.assertEqual(list(client.objects), ['Washington/c.tif'])
+        self.assertEqual((stats['F1'].skipped, stats['F2'].skipped, stats['F2'].files), (2, 1, 1))
+
+    def test_failures_are_counted(self):
+        stats = self.upload(FakeS3(fail={'b.tif'}))
+        self.assertEqual((stats['F1'].files, stats['F1'].failed), (1, 1))
+        self.assertEqual(self.queue_depth(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
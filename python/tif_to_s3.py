@@ -1,8 +1,17 @@
 import os
+import json
+import functools
+import itertools
+import time
+import threading
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectTimeoutError, EndpointConnectionError, ReadTimeoutError
 from tqdm import tqdm
 import sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
+from metrics import ACTIVE_WORKERS, QUEUE_DEPTH, S3_BYTES, S3_ERRORS, S3_REQUEST_SECONDS, start_exporter
 
 # CONFIGURATION
 S3_BUCKET   = ''         # your bucket name
@@ -10,88 +19,374 @@ DEST_PREFIX = 'Washington/'                  # S3 folder (prefix)
 BASE_DIR    = r'F:\HFImages\WashingtonTx'    # base directory path
 MAX_WORKERS = 256
 
-s3_client = boto3.client('s3')
+# Concurrent uploads start at INITIAL_WORKERS and are adjusted between
+# MIN_WORKERS and MAX_WORKERS from throughput and throttling every
+# ADJUST_WINDOW seconds
+INITIAL_WORKERS = 32
+MIN_WORKERS = 4
+ADJUST_WINDOW = 5.0
 
-def upload_file_to_s3(file_path, s3_key):
-    """Upload a single file to S3."""
+MB = 1024 * 1024
+
+# Files discovered ahead of the upload pool, and files sampled for multipart sizing
+DISCOVERY_AHEAD = 1000
+TRANSFER_SAMPLE = 1000
+
+# Local record of finished uploads so reruns skip them; VERIFY_MODE also
+# checks manifest entries against one S3 listing of DEST_PREFIX
+MANIFEST_PATH = 'tif_to_s3_manifest.jsonl'
+VERIFY_MODE = False
+
+# Metrics snapshot ('.json' for JSON, otherwise Prometheus text; None = off),
+# rewritten every METRICS_INTERVAL seconds and at exit
+METRICS_PATH = None
+METRICS_INTERVAL = 15
+
+# Created in main() by make_s3_client once MAX_WORKERS is final
+s3_client = None
+
+def make_s3_client(max_workers):
+    """Connection pool matches the worker ceiling; adaptive retries back off on throttling."""
+    return boto3.client('s3', config=Config(
+        max_pool_connections=max_workers,
+        retries={'mode': 'adaptive', 'max_attempts': 5},
+    ))
+
+THROTTLE_CODES = {'SlowDown', 'Throttling', 'ThrottlingException', 'RequestLimitExceeded',
+                  'ServiceUnavailable', '503', 'RequestTimeout'}
+
+class AdaptiveLimiter:
+    """
+    Caps concurrent uploads and tunes the cap from observed throughput (AIMD).
+
+    Each ADJUST_WINDOW the limit is halved if any request was throttled or
+    timed out, raised by `step` while bytes/s keeps improving, and lowered by
+    `step` when throughput drops off.
+    """
+
+    def __init__(self, initial=INITIAL_WORKERS, minimum=MIN_WORKERS, maximum=MAX_WORKERS,
+                 window=ADJUST_WINDOW, step=4):
+        self.limit = max(minimum, min(initial, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.window = window
+        self.step = step
+        self.active = 0
+        self._cond = threading.Condition()
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+        self._window_throttles = 0
+        self._last_rate = 0.0
+
+    def acquire(self):
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+
+    def release(self, nbytes, throttled=False):
+        with self._cond:
+            self.active -= 1
+            self._window_bytes += nbytes
+            if throttled:
+                self._window_throttles += 1
+            self._adjust()
+            self._cond.notify_all()
+
+    def _adjust(self):
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed < self.window:
+            return
+
+        rate = self._window_bytes / elapsed
+        if self._window_throttles:
+            self.limit = max(self.minimum, self.limit // 2)
+        elif rate >= self._last_rate * 1.05:
+            self.limit = min(self.maximum, self.limit + self.step)
+        elif rate < self._last_rate * 0.9:
+            self.limit = max(self.minimum, self.limit - self.step)
+
+        self._last_rate = rate
+        self._window_start = now
+        self._window_bytes = 0
+        self._window_throttles = 0
+
+def is_throttle(error):
+    """True for errors that mean S3 or the link is saturated, as opposed to
+    per-file problems like a missing source file."""
+    if isinstance(error, ClientError):
+        return error.response.get('Error', {}).get('Code') in THROTTLE_CODES
+    return isinstance(error, (ConnectTimeoutError, EndpointConnectionError, ReadTimeoutError))
+
+def transfer_config_for(sizes):
+    """
+    Chooses multipart settings from a folder's file sizes: the threshold sits
+    above the 95th percentile so typical images go up in one PUT, and the chunk
+    size keeps the largest file within S3's 10,000-part limit. Parallelism comes
+    from uploading many files at once, so per-file transfer threads are off.
+    """
+    if not sizes:
+        return TransferConfig(use_threads=False)
+    ordered = sorted(sizes)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    threshold = max(8 * MB, -(-p95 // MB) * MB)
+    chunksize = max(8 * MB, -(-ordered[-1] // 10000))
+    return TransferConfig(multipart_threshold=threshold, multipart_chunksize=chunksize, use_threads=False)
+
+class UploadManifest:
+    """
+    Append-only JSON-lines manifest of uploaded files keyed by source path.
+
+    Each entry stores the S3 key, size, mtime and ETag. The file is compacted
+    on open; a torn last line from a crash is ignored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.entries[entry['path']] = entry
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry) + '\n')
+        os.replace(tmp_path, path)
+
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def is_uploaded(self, file_path, s3_key, remote=None):
+        """True if file_path was uploaded to s3_key and is unchanged since.
+        With a remote listing, the object must also exist with the same ETag."""
+        entry = self.entries.get(file_path)
+        if not entry or entry['key'] != s3_key:
+            return False
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return False
+        if entry['size'] != st.st_size or entry['mtime'] != st.st_mtime:
+            return False
+        if remote is not None:
+            obj = remote.get(s3_key)
+            return obj is not None and obj['size'] == entry['size'] and obj['etag'] == entry['etag']
+        return True
+
+    def record(self, file_path, s3_key, size, mtime, etag):
+        entry = {'path': file_path, 'key': s3_key, 'size': size, 'mtime': mtime, 'etag': etag}
+        with self._lock:
+            self.entries[file_path] = entry
+            self._file.write(json.dumps(entry) + '\n')
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+def list_remote_objects(prefix):
+    """One paginated listing of prefix: {key: {'size', 'etag'}}."""
+    remote = {}
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=S3_BUCKET, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            remote[obj['Key']] = {'size': obj['Size'], 'etag': obj['ETag'].strip('"')}
+    return remote
+
+def upload_file_to_s3(file_path, s3_key, manifest=None, limiter=None, transfer_config=None):
+    """Upload a single file to S3 and record it in the manifest.
+    Returns (file_path, error, bytes_uploaded)."""
+    if limiter is not None:
+        limiter.acquire()
+    nbytes = 0
+    error = None
+    operation = 'upload'
     try:
-        s3_client.upload_file(file_path, S3_BUCKET, s3_key)
-        return (file_path, None)
+        with ACTIVE_WORKERS.track(pool='s3_uploads'):
+            st = os.stat(file_path)
+            with S3_REQUEST_SECONDS.time(operation='upload'):
+                s3_client.upload_file(file_path, S3_BUCKET, s3_key, Config=transfer_config)
+            nbytes = st.st_size
+            S3_BYTES.inc(nbytes)
+            if manifest is not None:
+                operation = 'head'
+                with S3_REQUEST_SECONDS.time(operation='head'):
+                    etag = s3_client.head_object(Bucket=S3_BUCKET, Key=s3_key)['ETag'].strip('"')
+                manifest.record(file_path, s3_key, st.st_size, st.st_mtime, etag)
     except Exception as e:
-        return (file_path, e)
-
-def find_files_to_upload(blu_path):
-    """Recursively find all files under blu_path (excluding .txt optional)."""
-    files_to_upload = []
-    for root, dirs, files in os.walk(blu_path):
-        dirs[:] = [d for d in dirs if d.lower() != 'bluewc001']  # skip that folder if needed
-        for file in files:
+        error = e
+        S3_ERRORS.inc(operation=operation, kind='throttle' if is_throttle(e) else 'other')
+    finally:
+        if limiter is not None:
+            limiter.release(nbytes, throttled=is_throttle(error))
+    return (file_path, error, nbytes)
+
+def scan_files(blu_path):
+    """
+    Streams files under blu_path in os.walk top-down order with entries
+    sorted by name, so duplicate basenames always resolve to the same keys.
+    Yields (path, size); .txt files and the bluewc001 folder are skipped.
+    """
+    stack = [blu_path]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            tqdm.write(f"Cannot scan {directory}: {e}", file=sys.stdout)
+            continue
+
+        subdirs = []
+        for entry in entries:
+            if entry.is_dir():
+                # os.walk doesn't descend into symlinked dirs either
+                if entry.name.lower() != 'bluewc001' and not entry.is_symlink():  # skip that folder if needed
+                    subdirs.append(entry.path)
             # keep this if you want to skip text files; remove if you want literally *everything*
-            if not file.lower().endswith('.txt'):
-                full_path = os.path.join(root, file)
-                files_to_upload.append(full_path)
-    return files_to_upload
-
-def upload_files_for_folder(folder_path):
-    """Upload all files in BLU subfolder to S3 under Washington/ (flat)."""
-    blu_path = os.path.join(folder_path, 'BLU')
-    if not os.path.isdir(blu_path):
-        print(f"Skipping {folder_path}: 'BLU' folder not found")
-        return
+            elif not entry.name.lower().endswith('.txt'):
+                yield entry.path, entry.stat().st_size
+        stack.extend(reversed(subdirs))
 
-    print(f"\nScanning for files in {blu_path} ...")
-    files_to_upload = find_files_to_upload(blu_path)
-    if not files_to_upload:
-        print(f"No files found in {blu_path}")
-        return
+def iter_upload_tasks(folder_paths):
+    """
+    Yields (folder_name, file_path, s3_key, size) across all BLU folders.
+
+    Keys are flat under DEST_PREFIX; within a folder a repeated basename gets
+    a _2, _3, ... suffix in scan order, as before.
+    """
+    for folder_path in folder_paths:
+        blu_path = os.path.join(folder_path, 'BLU')
+        if not os.path.isdir(blu_path):
+            tqdm.write(f"Skipping {folder_path}: 'BLU' folder not found", file=sys.stdout)
+            continue
+
+        folder_name = os.path.basename(folder_path)
+        seen = {}  # basename -> count
+        for file_path, size in scan_files(blu_path):
+            base = os.path.basename(file_path)  # no subfolders in the key
+            if base in seen:
+                seen[base] += 1
+                name, ext = os.path.splitext(base)
+                key_name = f"{name}_{seen[base]}{ext}"  # e.g., file_2.tif
+            else:
+                seen[base] = 1
+                key_name = base
+            yield folder_name, file_path, f"{DEST_PREFIX}{key_name}", size
+
+class FolderStats:
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.failed = 0
+        self.skipped = 0
+        self.first_start = None
+        self.last_end = None
+
+    def report(self, folder_name):
+        elapsed = max((self.last_end or 0) - (self.first_start or 0), 1e-9)
+        return (f"{folder_name}: {self.files} files, {self.bytes / MB:,.1f} MB in {elapsed:.1f}s "
+                f"({self.bytes / MB / elapsed:,.2f} MB/s, {self.files / elapsed:,.1f} files/s), "
+                f"{self.failed} failed, {self.skipped} skipped")
 
-    print(f"Found {len(files_to_upload)} files. Starting upload...\n")
-
-    # Build flat keys under DEST_PREFIX with collision handling
-    files_and_keys = []
-    seen = {}  # basename -> count
-    for file_path in files_to_upload:
-        base = os.path.basename(file_path)  # no subfolders in the key
-        if base in seen:
-            seen[base] += 1
-            name, ext = os.path.splitext(base)
-            key_name = f"{name}_{seen[base]}{ext}"  # e.g., file_2.tif
-        else:
-            seen[base] = 1
-            key_name = base
-
-        s3_key = f"{DEST_PREFIX}{key_name}"
-        files_and_keys.append((file_path, s3_key))
-
-    # Upload with a progress bar; write messages to the same stream
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {executor.submit(upload_file_to_s3, fp, key): (fp, key) for fp, key in files_and_keys}
-        with tqdm(total=len(futures),
-                  desc=f"Uploading {os.path.basename(folder_path)}",
-                  unit="file",
-                  file=sys.stdout,
-                  leave=True) as pbar:
-            for future in as_completed(futures):
-                (file_path, key) = futures[future]
-                _, error = future.result()
+def upload_all(folder_paths, manifest=None, remote=None, limiter=None):
+    """
+    Streams files from every folder into one shared upload pool.
+
+    Discovery runs ahead of the uploads by at most DISCOVERY_AHEAD files, so
+    the pool stays busy across folder boundaries without holding the whole
+    tree. Returns {folder_name: FolderStats}.
+    """
+    stats = {}
+    slots = threading.BoundedSemaphore(MAX_WORKERS + DISCOVERY_AHEAD)
+    stats_lock = threading.Lock()
+    tasks = iter_upload_tasks(folder_paths)
+
+    # Size the multipart settings from the first TRANSFER_SAMPLE files found
+    sample = []
+    for task in tasks:
+        sample.append(task)
+        if len(sample) >= TRANSFER_SAMPLE:
+            break
+    transfer_config = transfer_config_for([size for _, _, _, size in sample])
+
+    with tqdm(desc="Uploading", unit="file", file=sys.stdout) as pbar:
+        def on_done(future, folder_name, key):
+            file_path, error, nbytes = future.result()
+            QUEUE_DEPTH.dec(queue='s3_uploads')
+            with stats_lock:
+                folder = stats[folder_name]
+                folder.last_end = time.perf_counter()
                 if error:
+                    folder.failed += 1
                     tqdm.write(f"Failed to upload {file_path} -> s3://{S3_BUCKET}/{key}: {error}",
                                file=sys.stdout)
+                else:
+                    folder.files += 1
+                    folder.bytes += nbytes
                 pbar.update(1)
+                if limiter is not None:
+                    pbar.set_postfix(folder=folder_name, workers=limiter.limit)
+            slots.release()
+
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            for folder_name, file_path, key, _ in itertools.chain(sample, tasks):
+                with stats_lock:
+                    folder = stats.setdefault(folder_name, FolderStats())
+                    if folder.first_start is None:
+                        folder.first_start = time.perf_counter()
+
+                if manifest is not None and manifest.is_uploaded(file_path, key, remote):
+                    with stats_lock:
+                        folder.skipped += 1
+                    continue
+
+                slots.acquire()
+                QUEUE_DEPTH.inc(queue='s3_uploads')
+                future = executor.submit(upload_file_to_s3, file_path, key, manifest, limiter, transfer_config)
+                future.add_done_callback(functools.partial(on_done, folder_name=folder_name, key=key))
 
-    print(f"Upload complete for {os.path.basename(folder_path)}.\n")
+    for folder_name, folder in stats.items():
+        print(folder.report(folder_name))
+    return stats
 
 def main():
-    all_folders = [f for f in os.listdir(BASE_DIR) if os.path.isdir(os.path.join(BASE_DIR, f))]
+    global s3_client
+    s3_client = make_s3_client(MAX_WORKERS)
+    start_exporter(METRICS_PATH, 'tif_to_s3', METRICS_INTERVAL)
+    all_folders = sorted(f for f in os.listdir(BASE_DIR) if os.path.isdir(os.path.join(BASE_DIR, f)))
     if not all_folders:
         print(f"No folders found in base directory: {BASE_DIR}")
         return
 
     print(f"Found {len(all_folders)} folders to process.\n")
 
-    for folder_name in tqdm(all_folders, desc="Processing folders", unit="folder"):
-        folder_path = os.path.join(BASE_DIR, folder_name)
-        upload_files_for_folder(folder_path)
+    manifest = UploadManifest(MANIFEST_PATH)
+    print(f"Manifest {MANIFEST_PATH} has {len(manifest.entries)} uploaded files.")
+
+    remote = None
+    if VERIFY_MODE:
+        print(f"Listing s3://{S3_BUCKET}/{DEST_PREFIX} to verify the manifest...")
+        remote = list_remote_objects(DEST_PREFIX)
+        print(f"Found {len(remote)} objects under {DEST_PREFIX}.")
+
+    limiter = AdaptiveLimiter(INITIAL_WORKERS, MIN_WORKERS, MAX_WORKERS, ADJUST_WINDOW)
+
+    try:
+        stats = upload_all([os.path.join(BASE_DIR, f) for f in all_folders], manifest, remote, limiter)
+    finally:
+        manifest.close()
+
+    failed = sum(folder.failed for folder in stats.values())
+    if failed:
+        print(f"{failed} uploads failed; rerun to retry them (finished files are skipped)")
+        sys.exit(1)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
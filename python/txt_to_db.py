@@ -1,11 +1,21 @@
 import os
 import glob
+import functools
+import collections
+import time
+import threading
 import concurrent.futures
 import pymysql
-from datetime import datetime
 from tqdm import tqdm
+from db_pool import ConnectionPool
+from eor_reader import iter_records, read_header, shard_ranges
+from prime_convert import ABSTRACT_CODE_INDEX, convert_prime_batch
+from metrics import (ACTIVE_WORKERS, DB_STATEMENT_SECONDS, QUEUE_DEPTH, ROWS_CONVERTED, ROWS_INSERTED,
+                     ROWS_READ, ROWS_REJECTED, VALUES_REJECTED, start_exporter)
 
+# Chunk threads per file, and files processed side by side
 WORKERS = 32
+FILE_WORKERS = 2
 BASE_DIR = ''
 DB_CONFIG = {
     'host': '',
@@ -14,88 +24,251 @@ DB_CONFIG = {
     'database': ''
 }
 
-def ensure_abstract_exists(cursor, abstract_code):
-    if not abstract_code or abstract_code.strip() == '':
-        return None
-    cursor.execute("SELECT abstractCode FROM Abstract WHERE abstractCode = %s", (abstract_code,))
-    result = cursor.fetchone()
-    if not result:
-        return None
-    return abstract_code
-
-def process_prime_chunk(records, headers):
-    db = pymysql.connect(**DB_CONFIG)
-    cursor = db.cursor()
+# Every chunk thread holds one connection, so main() sizes the pool to
+# FILE_WORKERS * WORKERS; DB_SESSION is applied to each connection
+# (e.g. db_pool.BULK_LOAD_SESSION to skip unique/FK checks on a trusted load)
+DB_SESSION = {}
+db_pool = None
+
+# County the prime rows are written under (Document.countyID) and the PRSERV
+# map scope (None = no county, all Documents); keyset batch size (None = stream)
+COUNTY_ID = None
+PRSERV_MAP_BATCH_SIZE = None
+UNRESOLVED_REPORT = 'unresolved_prserv.txt'
+
+# Reload the Abstract cache on a miss if it is older than this (None = never)
+ABSTRACT_REFRESH_SECONDS = None
+
+# Worker processes for prime field conversion (0 = convert in the loader threads)
+CONVERT_PROCESSES = os.cpu_count()
+CONVERT_BATCH_SIZE = 5000
+REJECTED_LOCK = threading.Lock()
+
+# Document rows per multi-row INSERT, and rows between commits
+BATCH_SIZE = 1000
+COMMIT_INTERVAL = 10000
+
+# Metrics snapshot ('.json' for JSON, otherwise Prometheus text; None = off),
+# rewritten every METRICS_INTERVAL seconds and at exit
+METRICS_PATH = None
+METRICS_INTERVAL = 15
+
+INSERT_DOCUMENT_SQL = """
+    INSERT INTO Document
+    (PRSERV, book, page, clerkNumber, instrumentType, acres, abstractCode, subBlock,
+    legalDescription, instrumentDate, filingDate, remarks, GFNNumber, abstractID, countyID)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+INSERT_PARTY_SQL = """
+    INSERT INTO Party (documentID, name, role)
+    VALUES (%s, %s, %s)
+"""
+
+class AbstractLookup:
+    """
+    Thread-safe abstractCode -> abstractID cache shared by all prime chunks.
+
+    Loaded once per county; if refresh_seconds is set, a miss older than that
+    reloads the table so codes added mid-run are picked up. abstract_to_db
+    numbers codes per county, so without a county_id nothing is loaded and
+    every code resolves to None (abstractID stays NULL).
+    """
+
+    def __init__(self, county_id=None, refresh_seconds=None):
+        self.county_id = county_id
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._codes = {}
+        self._loaded_at = 0.0
+        self.refresh()
+
+    def refresh(self, cursor=None):
+        """Reloads the codes. Pass the caller's cursor when it already holds a
+        pooled connection, so a refresh never waits on the pool itself."""
+        if self.county_id is None:
+            return
+        if cursor is None:
+            with db_pool.connection() as db, db.cursor() as own_cursor:
+                return self.refresh(own_cursor)
+
+        cursor.execute("""
+            SELECT abstractCode, abstractID FROM Abstract
+            WHERE abstractCode IS NOT NULL AND countyID = %s
+        """, (self.county_id,))
+        codes = {}
+        for code, abstract_id in cursor.fetchall():
+            codes.setdefault(code.strip(), abstract_id)
+
+        with self._lock:
+            self._codes = codes
+            self._loaded_at = time.monotonic()
+
+    def resolve(self, abstract_code, cursor=None):
+        """Returns the abstractID for abstract_code, or None if unknown."""
+        if self.county_id is None or not abstract_code or not abstract_code.strip():
+            return None
+        code = abstract_code.strip()
+        abstract_id = self._codes.get(code)
+        if abstract_id is None and self.refresh_seconds is not None:
+            # One thread reloads; the rest wait and then read the fresh map
+            with self._refresh_lock:
+                if time.monotonic() - self._loaded_at >= self.refresh_seconds:
+                    self.refresh(cursor)
+            abstract_id = self._codes.get(code)
+        return abstract_id
+
+def flush_rows(cursor, sql, rows, table, statement, key_name):
+    """Insert a batch of rows with one multi-row statement.
+    Falls back to row-by-row inserts so one bad record doesn't drop the batch."""
+    try:
+        with DB_STATEMENT_SECONDS.time(statement=statement):
+            cursor.executemany(sql, rows)
+        ROWS_INSERTED.inc(len(rows), table=table)
+        return len(rows)
+    except Exception as e:
+        print(f"Batch of {len(rows)} {table} rows failed, retrying row by row: {e}")
+
+    inserted = 0
+    for row in rows:
+        try:
+            with DB_STATEMENT_SECONDS.time(statement=f'{statement}_row'):
+                cursor.execute(sql, row)
+            inserted += 1
+        except Exception as e:
+            print(f"Error inserting {table} record with {key_name}={row[0]}: {e}")
+    ROWS_INSERTED.inc(inserted, table=table)
+    ROWS_REJECTED.inc(len(rows) - inserted, table=table, reason='insert_error')
+    return inserted
+
+def flush_document_rows(cursor, rows):
+    return flush_rows(cursor, INSERT_DOCUMENT_SQL, rows, 'Document', 'insert_document', 'PRSERV')
 
-    for record in tqdm(records, desc="Prime chunk records", leave=False):
+def iter_record_batches(records, batch_size):
+    batch = []
+    for record in records:
         if not record.strip():
             continue
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def process_prime_chunk(records, headers, abstract_lookup, convert_pool, rejected):
+    with db_pool.connection() as db:
+        return insert_prime_records(db, records, headers, abstract_lookup, convert_pool, rejected)
+
+def insert_prime_records(db, records, headers, abstract_lookup, convert_pool, rejected):
+    cursor = db.cursor()
 
-        fields = record.rstrip('\n').split('\t')
-        data = dict(zip(headers, fields))
-
-        file_stamp = data.get('Instrument_Date')
-        file_stamp_date = None
-        if file_stamp and file_stamp.strip():
-            try:
-                file_stamp_date = datetime.strptime(file_stamp.split()[0], '%Y-%m-%d')
-            except:
-                pass
-
-        filing_date_str = data.get('Filing_Date')
-        filing_date = None
-        if filing_date_str and filing_date_str.strip():
-            try:
-                filing_date = datetime.strptime(filing_date_str.split()[0], '%Y-%m-%d')
-            except:
-                pass
-
-        acres_val = data.get('Acres')
-        acres = float(acres_val) if acres_val and acres_val.strip() else None
-
-        gfn_val = data.get('GF_Number')
-        gfn = int(gfn_val) if gfn_val and gfn_val.strip() else None
-
-        abstract_code = data.get('Abstract')
-        if abstract_code:
-            ensure_abstract_exists(cursor, abstract_code)
-
-        try:
-            cursor.execute("""
-                INSERT INTO Document
-                (PRSERV, book, page, clerkNumber, instrumentType, acres, abstractCode, subBlock,
-                legalDescription, instrumentDate, filingDate, remarks, GFNNumber)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                data.get('PRSERV'),
-                data.get('Book'),
-                data.get('Page'),
-                data.get('Clerk_Number'),
-                data.get('Instrument_Type'),
-                acres,
-                abstract_code,
-                data.get('Sub_Block_Lot'),
-                data.get('Brief_Legal'),
-                file_stamp_date,
-                filing_date,
-                data.get('Remarks'),
-                gfn,
-            ))
-            db.commit()
-        except Exception as e:
-            print(f"Error inserting record with PRSERV={data.get('PRSERV')}: {e}")
-
+    rows = []
+    inserted = 0
+    last_commit = 0
+    pending = collections.deque()
+
+    def write_converted(converted_rows, batch_rejected):
+        nonlocal rows, inserted, last_commit
+        with REJECTED_LOCK:
+            rejected.update(batch_rejected)
+        ROWS_CONVERTED.inc(len(converted_rows), table='Document')
+        for field, count in batch_rejected.items():
+            VALUES_REJECTED.inc(count, field=field)
+
+        for row in converted_rows:
+            rows.append(row + (abstract_lookup.resolve(row[ABSTRACT_CODE_INDEX], cursor), COUNTY_ID))
+
+            if len(rows) >= BATCH_SIZE:
+                inserted += flush_document_rows(cursor, rows)
+                rows = []
+                if inserted - last_commit >= COMMIT_INTERVAL:
+                    db.commit()
+                    last_commit = inserted
+
+    # Parsing runs in the process pool; keep a couple of batches in flight so
+    # conversion overlaps with this thread's inserts
+    batches = iter_record_batches(tqdm(records, desc="Prime chunk records", leave=False), CONVERT_BATCH_SIZE)
+    for batch in batches:
+        ROWS_READ.inc(len(batch), table='Document')
+        if convert_pool is None:
+            write_converted(*convert_prime_batch(batch, headers))
+            continue
+        pending.append(convert_pool.submit(convert_prime_batch, batch, headers))
+        QUEUE_DEPTH.inc(queue='convert')
+        if len(pending) >= 2:
+            QUEUE_DEPTH.dec(queue='convert')
+            write_converted(*pending.popleft().result())
+    while pending:
+        QUEUE_DEPTH.dec(queue='convert')
+        write_converted(*pending.popleft().result())
+
+    if rows:
+        inserted += flush_document_rows(cursor, rows)
+    db.commit()
 
     cursor.close()
-    db.close()
-
-def process_multi_chunk(records, headers):
-    db = pymysql.connect(**DB_CONFIG)
+    return inserted
+
+def load_prserv_map(county_id=None, batch_size=None):
+    """
+    Builds the PRSERV -> documentID map in one pass over Document.
+
+    With batch_size=None the rows are streamed through a server-side cursor;
+    otherwise they are fetched in documentID keyset batches of batch_size.
+    """
+    county_filter = "AND countyID = %s" if county_id is not None else ""
+    county_args = (county_id,) if county_id is not None else ()
+    prserv_map = {}
+
+    with db_pool.connection() as db:
+        if batch_size is None:
+            with db.cursor(pymysql.cursors.SSCursor) as cursor:
+                cursor.execute(f"""
+                    SELECT PRSERV, documentID FROM Document
+                    WHERE PRSERV IS NOT NULL {county_filter}
+                """, county_args)
+                for prserv, document_id in cursor:
+                    prserv_map.setdefault(prserv, document_id)
+        else:
+            last_id = 0
+            with db.cursor() as cursor:
+                while True:
+                    cursor.execute(f"""
+                        SELECT documentID, PRSERV FROM Document
+                        WHERE documentID > %s AND PRSERV IS NOT NULL {county_filter}
+                        ORDER BY documentID
+                        LIMIT %s
+                    """, (last_id, *county_args, batch_size))
+                    rows = cursor.fetchall()
+                    if not rows:
+                        break
+                    for document_id, prserv in rows:
+                        prserv_map.setdefault(prserv, document_id)
+                    last_id = rows[-1][0]
+
+    return prserv_map
+
+def flush_party_rows(cursor, rows):
+    return flush_rows(cursor, INSERT_PARTY_SQL, rows, 'Party', 'insert_party', 'documentID')
+
+def process_multi_chunk(records, headers, prserv_map, unresolved):
+    with db_pool.connection() as db:
+        return insert_multi_records(db, records, headers, prserv_map, unresolved)
+
+def insert_multi_records(db, records, headers, prserv_map, unresolved):
     cursor = db.cursor()
 
+    rows = []
+    inserted = 0
+    last_commit = 0
+    missing = set()
+
     for record in tqdm(records, desc="Multi chunk records", leave=False):
         if not record.strip():
             continue
+        ROWS_READ.inc(table='Party')
         fields = record.strip().split('\t')
         data = dict(zip(headers, fields))
 
@@ -103,61 +276,61 @@ def process_multi_chunk(records, headers):
         grantor = data.get('Grantor')
         grantee = data.get('Grantee')
 
-        # Find documentID using PRSERV
-        document_id = None
-        if prserv:
-            cursor.execute("SELECT documentID FROM Document WHERE PRSERV = %s LIMIT 1", (prserv,))
-            result = cursor.fetchone()
-            if result:
-                document_id = result[0]
-
-        if document_id:
-            if grantor and grantor.strip():
-                cursor.execute("""
-                    INSERT INTO Party (documentID, name, role)
-                    VALUES (%s, %s, 'Grantor')
-                """, (document_id, grantor.strip()))
-
-            if grantee and grantee.strip():
-                cursor.execute("""
-                    INSERT INTO Party (documentID, name, role)
-                    VALUES (%s, %s, 'Grantee')
-                """, (document_id, grantee.strip()))
-            db.commit()
-        else:
-            print(f"Warning: No Document found with PRSERV={prserv} for Party insertion")
+        document_id = prserv_map.get(prserv) if prserv else None
+        if not document_id:
+            missing.add(prserv)
+            ROWS_REJECTED.inc(table='Party', reason='unresolved_prserv')
+            continue
 
-    cursor.close()
-    db.close()
+        if grantor and grantor.strip():
+            rows.append((document_id, grantor.strip(), 'Grantor'))
+        if grantee and grantee.strip():
+            rows.append((document_id, grantee.strip(), 'Grantee'))
 
-def process_file_multithreaded(file_path, process_chunk_func, num_threads=4):
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
+        if len(rows) >= BATCH_SIZE:
+            inserted += flush_party_rows(cursor, rows)
+            rows = []
+            if inserted - last_commit >= COMMIT_INTERVAL:
+                db.commit()
+                last_commit = inserted
 
+    if rows:
+        inserted += flush_party_rows(cursor, rows)
+    db.commit()
 
-    records = [r.lstrip('\n') for r in content.split('{EOR}') if r.strip()]
-    if not records:
-        return
-    
-    # Extract header once
-    header_line = records[0]
-    headers = header_line.strip('\n').split('\t')
+    cursor.close()
 
-    # Data records exclude header
-    data_records = records[1:]
+    # set.update is atomic under the GIL, so chunks can share one set
+    unresolved.update(missing)
+    return inserted
 
-    chunk_size = len(data_records) // num_threads
-    chunks = [data_records[i*chunk_size:(i+1)*chunk_size] for i in range(num_threads)]
-    if len(data_records) % num_threads != 0:
-        chunks[-1].extend(data_records[num_threads*chunk_size:])
+def write_unresolved_report(unresolved, report_path):
+    with open(report_path, 'w', encoding='utf-8') as f:
+        for prserv in sorted(p or '' for p in unresolved):
+            f.write(f"{prserv}\n")
+    print(f"{len(unresolved)} PRSERVs had no matching Document; see {report_path}")
 
-    with tqdm(total=num_threads, desc=f"Processing {os.path.basename(file_path)} chunks") as pbar:
-        def wrapped_func(chunk):
-            process_chunk_func(chunk, headers)
+def process_file_multithreaded(file_path, process_chunk_func, num_threads=4):
+    # Header is the first record; data records are streamed per shard via mmap
+    headers, data_start = read_header(file_path)
+    if headers is None:
+        return 0
+
+    # Byte-range shards aligned on {EOR} so each worker reads only its own slice
+    shards = shard_ranges(file_path, num_threads, start=data_start)
+    if not shards:
+        return 0
+
+    with tqdm(total=len(shards), desc=f"Processing {os.path.basename(file_path)} chunks") as pbar:
+        def wrapped_func(shard):
+            start, end = shard
+            with ACTIVE_WORKERS.track(pool='chunks'):
+                result = process_chunk_func(iter_records(file_path, start, end), headers)
             pbar.update(1)
+            return result or 0
 
         with concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) as executor:
-            executor.map(wrapped_func, chunks)
+            return sum(executor.map(wrapped_func, shards))
 
 def find_all_blu_file_pairs(base_dir):
     wastp_folders = glob.glob(os.path.join(base_dir, 'WASTP*'))
@@ -176,32 +349,67 @@ def find_all_blu_file_pairs(base_dir):
     return file_pairs
 
 def main():
+    global db_pool
+    db_pool = ConnectionPool(DB_CONFIG, size=FILE_WORKERS * WORKERS, session=DB_SESSION)
+    start_exporter(METRICS_PATH, 'txt_to_db', METRICS_INTERVAL)
     file_pairs = find_all_blu_file_pairs(BASE_DIR)
     print(f"Found {len(file_pairs)} WASTP folders with prime & multi files.")
 
+    # Abstract codes are cached once and shared by every prime chunk
+    abstract_lookup = AbstractLookup(COUNTY_ID, ABSTRACT_REFRESH_SECONDS)
+    if COUNTY_ID is None:
+        print("COUNTY_ID is not set: Document.abstractID is left NULL (codes overlap across counties).")
+    convert_pool = concurrent.futures.ProcessPoolExecutor(CONVERT_PROCESSES) if CONVERT_PROCESSES else None
+    rejected = collections.Counter()
+    prime_chunk = functools.partial(
+        process_prime_chunk,
+        abstract_lookup=abstract_lookup,
+        convert_pool=convert_pool,
+        rejected=rejected,
+    )
+
     # First: Process ALL prime files (Documents)
+    prime_start = time.perf_counter()
+    documents_inserted = 0
     with tqdm(total=len(file_pairs), desc="Processing all prime files") as prime_pbar:
         def process_prime_wrapper(pair):
             prime_path, _ = pair
-            process_file_multithreaded(prime_path, process_prime_chunk, WORKERS)
+            inserted = process_file_multithreaded(prime_path, prime_chunk, WORKERS)
             prime_pbar.update(1)
+            return inserted
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=FILE_WORKERS) as executor:
             futures = [executor.submit(process_prime_wrapper, pair) for pair in file_pairs]
             for future in concurrent.futures.as_completed(futures):
                 try:
-                    future.result()
+                    documents_inserted += future.result()
                 except Exception as e:
                     print(f"Error occurred processing prime files: {e}")
 
+    if convert_pool is not None:
+        convert_pool.shutdown()
+
+    elapsed = time.perf_counter() - prime_start
+    rate = documents_inserted / elapsed if elapsed > 0 else 0
+    print(f"Inserted {documents_inserted} Documents in {elapsed:.1f}s ({rate:,.0f} rows/s)")
+    for field, count in sorted(rejected.items()):
+        print(f"Rejected {count} unparseable {field} values (stored as NULL)")
+
+    # Resolve PRSERV -> documentID once for all multi chunks
+    print("Loading PRSERV -> documentID map...")
+    prserv_map = load_prserv_map(COUNTY_ID, PRSERV_MAP_BATCH_SIZE)
+    print(f"Loaded {len(prserv_map)} PRSERVs.")
+    unresolved = set()
+    multi_chunk = functools.partial(process_multi_chunk, prserv_map=prserv_map, unresolved=unresolved)
+
     # Then: Process ALL multi files (Parties)
     with tqdm(total=len(file_pairs), desc="Processing all multi files") as multi_pbar:
         def process_multi_wrapper(pair):
             _, multi_path = pair
-            process_file_multithreaded(multi_path, process_multi_chunk, WORKERS)
+            process_file_multithreaded(multi_path, multi_chunk, WORKERS)
             multi_pbar.update(1)
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=FILE_WORKERS) as executor:
             futures = [executor.submit(process_multi_wrapper, pair) for pair in file_pairs]
             for future in concurrent.futures.as_completed(futures):
                 try:
@@ -209,5 +417,10 @@ def main():
                 except Exception as e:
                     print(f"Error occurred processing multi files: {e}")
 
+    if unresolved:
+        write_unresolved_report(unresolved, UNRESOLVED_REPORT)
+
+    db_pool.close()
+
 if __name__ == '__main__':
     main()
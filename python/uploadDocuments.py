@@ -1,9 +1,16 @@
 import os
 import re
+import csv
+import queue
+import threading
 import uuid
 import pymysql
 import boto3
+from botocore.config import Config
 from datetime import datetime
+from functools import lru_cache
+from db_pool import ConnectionPool
+from fixed_width import get_layout
 
 # --- CONFIGURATION ---
 
@@ -11,6 +18,16 @@ BASE_DIR = ''
 S3_BUCKET = ''
 COUNTY_ID = 1
 BASE_S3_DIR = 'Washington/'
+INDEX1_LAYOUT = 'washington_index1'  # see fixed_width.LAYOUTS
+
+# Background S3 upload stage: worker threads, queued files, and retry passes
+UPLOAD_WORKERS = 16
+UPLOAD_QUEUE_SIZE = 1000
+UPLOAD_RETRY_PASSES = 1
+UPLOAD_REPORT = 'upload_results.csv'
+
+# Documents per multi-row INSERT; each statement gets a consecutive documentID block
+DOCUMENT_INSERT_BATCH = 1000
 
 DB_CONFIG = {
     'host': '',
@@ -20,6 +37,8 @@ DB_CONFIG = {
     'cursorclass': pymysql.cursors.DictCursor
 }
 
+db_pool = ConnectionPool(DB_CONFIG, size=1)
+
 # --- HELPERS ---
 
 def base36_encode(number):
@@ -33,72 +52,112 @@ def base36_encode(number):
         result = chars[i] + result
     return result.zfill(9)
 
-def upload_to_s3(file_path, bucket, key):
-    """Uploads a file to AWS S3 with the given key."""
-    s3 = boto3.client('s3')
-    s3.upload_file(file_path, bucket, key)
-    print(f"Uploaded '{file_path}' as '{key}' to bucket '{bucket}'")
+class S3UploadPipeline:
+    """
+    Background S3 upload stage fed by a bounded queue.
+
+    Worker threads share one boto3 client (sized to the worker count) and run
+    while the caller keeps inserting Documents; submit() only blocks when the
+    queue is full. Each file's outcome is kept in `results`, keyed by S3 key,
+    as (file_path, prserv, error) so failures can be retried or reconciled.
+    """
+
+    def __init__(self, bucket, workers=UPLOAD_WORKERS, queue_size=UPLOAD_QUEUE_SIZE):
+        self.bucket = bucket
+        self.client = boto3.client('s3', config=Config(max_pool_connections=workers))
+        self.tasks = queue.Queue(maxsize=queue_size)
+        self.results = {}
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def _worker(self):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                self.tasks.task_done()
+                return
+            file_path, key, prserv = task
+            error = None
+            try:
+                self.client.upload_file(file_path, self.bucket, key)
+            except Exception as e:
+                error = e
+            self.record(file_path, key, prserv, error)
+            self.tasks.task_done()
+
+    def record(self, file_path, key, prserv, error=None):
+        with self._lock:
+            self.results[key] = (file_path, prserv, error)
+
+    def submit(self, file_path, key, prserv):
+        self.tasks.put((file_path, key, prserv))
+
+    def failures(self):
+        with self._lock:
+            return [(key, file_path, prserv, error)
+                    for key, (file_path, prserv, error) in self.results.items() if error]
+
+    def retry_failed(self):
+        """Re-queues failed uploads whose source file still exists and waits for them."""
+        retried = 0
+        for key, file_path, prserv, _ in self.failures():
+            if os.path.isfile(file_path):
+                self.submit(file_path, key, prserv)
+                retried += 1
+        self.tasks.join()
+        return retried
+
+    def close(self):
+        self.tasks.join()
+        for _ in self._threads:
+            self.tasks.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def write_report(self, report_path):
+        with self._lock, open(report_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['key', 'file_path', 'prserv', 'status', 'error'])
+            for key, (file_path, prserv, error) in sorted(self.results.items()):
+                writer.writerow([key, file_path, prserv, 'failed' if error else 'uploaded', error or ''])
+
+@lru_cache(maxsize=65536)
+def format_file_date(fileDate_str):
+    return datetime.strptime(fileDate_str, '%m%d%Y').strftime('%Y-%m-%d')
+
+@lru_cache(maxsize=65536)
+def format_file_stamp_date(fileStampDate_str):
+    return datetime.strptime(fileStampDate_str, '%m%d%Y%H:%M').strftime('%Y-%m-%d %H:%M:%S')
 
 def format_dates(fileDate_str, fileStampDate_str):
-    fileDate_dt = datetime.strptime(fileDate_str, '%m%d%Y').date()
-    fileStampDate_dt = datetime.strptime(fileStampDate_str, '%m%d%Y%H:%M')
-    
     return {
-        'fileDate': fileDate_dt.strftime('%Y-%m-%d'),
-        'fileStampDate': fileStampDate_dt.strftime('%Y-%m-%d %H:%M:%S')
+        'fileDate': format_file_date(fileDate_str),
+        'fileStampDate': format_file_stamp_date(fileStampDate_str)
     }
 
 # --- PARSERS ---
 
-def parse_index1(file_path):
+def parse_index1(file_path, layout_name=INDEX1_LAYOUT):
     """
-    Parses a fixed-width file.
+    Parses a fixed-width INDEX1 file.
 
     Args:
         file_path (str): Path to the fixed-width file.
-        columns (list of tuples): Each tuple is (column_name, width).
+        layout_name (str): Registered fixed_width layout describing the columns.
 
-    Returns:
-        List of dicts, each dict represents a parsed line keyed by column names.
+    Yields:
+        One dict per line, keyed by column names, with dates reformatted.
     """
-    data = []
-
-    columns = [
-        ('FileName', 30),
-        ('Grantor', 40),
-        ('Grantee', 40),
-        ('instrumentType', 22),
-        ('fileStampDate', 22),
-        ('fileDate', 8),
-        ('legalDescription', 42),
-        ('filename', None),
-    ]
-
+    layout = get_layout(layout_name)
 
     with open(file_path, 'r', encoding='utf-8') as f:
         for line in f:
-            pos = 0
-            record = {}
-            for i, (col_name, width) in enumerate(columns):
-                if width is None:
-                    # Take rest of line for last column
-                    raw_value = line[pos:].rstrip('\n')
-                    record[col_name] = raw_value.strip()
-                    break
-                else:
-                    raw_value = line[pos:pos+width]
-                    record[col_name] = raw_value.strip()
-                    pos += width
-            record['fileStampDate'] = record['fileStampDate'][9:]
-
-            formatted_dates = format_dates(record['fileDate'],record['fileStampDate'])
-
-            record['fileStampDate'] = formatted_dates['fileStampDate']
-            record['fileDate'] = formatted_dates['fileDate']
-
-            data.append(record)
-
-    return data
+            record = layout.parse(line)
+            record['fileDate'] = format_file_date(record['fileDate'])
+            record['fileStampDate'] = format_file_stamp_date(record['fileStampDate'][9:])
+            yield record
 
 def parse_index2(file_path):
     """
@@ -129,9 +188,47 @@ def parse_index2(file_path):
 
     return data
 
+# --- ID ALLOCATION ---
+
+def insert_documents(cursor, rows):
+    """
+    Inserts Document rows (countyID, instrumentType, instrumentDate, filingDate,
+    legalDescription) with one multi-row INSERT and returns the first documentID.
+
+    A multi-row INSERT is a "simple insert" to InnoDB, so its rows get one
+    consecutive AUTO_INCREMENT block starting at LAST_INSERT_ID(). Rows go in
+    with a placeholder PRSERV tagged for this statement; the UPDATE that sets
+    the real base36 PRSERV only matches the block if it really is ours and
+    consecutive, and it runs in the caller's transaction.
+    """
+    tag = uuid.uuid4().hex[:6]
+    params = []
+    for i, row in enumerate(rows):
+        params.append(f"{tag}{i:04d}")
+        params.extend(row)
+
+    placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(rows))
+    cursor.execute(f"""
+        INSERT INTO Document (PRSERV, countyID, instrumentType, instrumentDate, filingDate, legalDescription)
+        VALUES {placeholders}
+    """, params)
+    # pymysql's lastrowid is LAST_INSERT_ID(): the id of the statement's first row
+    first_id = cursor.lastrowid
+    last_id = first_id + len(rows) - 1
+
+    # LPAD(CONV(id, 10, 36), 9, '0') is base36_encode(id), computed server-side
+    updated = cursor.execute("""
+        UPDATE Document SET PRSERV = LPAD(CONV(documentID, 10, 36), 9, '0')
+        WHERE documentID BETWEEN %s AND %s AND PRSERV LIKE %s
+    """, (first_id, last_id, f"{tag}%"))
+    if updated != len(rows):
+        raise RuntimeError(f"documentIDs {first_id}..{last_id} are not one consecutive block "
+                           f"({updated} of {len(rows)} rows matched); check innodb_autoinc_lock_mode")
+    return first_id
+
 # --- MAIN PROCESSING FUNCTION ---
 
-def process_folder(folder_path, connection, bucket_name):
+def process_folder(folder_path, connection, uploader):
     print(f"Processing folder: {folder_path}")
 
     index1_path = os.path.join(folder_path, 'INDEX1.TXT')
@@ -141,103 +238,108 @@ def process_folder(folder_path, connection, bucket_name):
         print(f"Missing INDEX1.txt in {folder_path}, skipping.")
         return
 
-    index1_data = parse_index1(index1_path)  # list of dicts
     index2_data = parse_index2(index2_path)  # dict with 'grantors' and 'grantees'
 
-    documents = index1_data  # list of dicts now
+    documents = []
+    skipped = 0
+    for metadata in parse_index1(index1_path):
+        if metadata.get('FileName'):
+            documents.append(metadata)
+        else:
+            skipped += 1
+    if skipped:
+        print(f"Skipping {skipped} records without FileName")
+    if not documents:
+        return
 
+    countyID = COUNTY_ID
+
+    document_rows = []
+    parties = []
+    for metadata in documents:
+        filename = metadata['FileName']
+
+        # Combine grantors/grantees from INDEX2 and the INDEX1 line itself
+        grantors = set(index2_data['grantors'].get(filename, set()))
+        grantees = set(index2_data['grantees'].get(filename, set()))
+        if metadata.get('Grantor'):
+            grantors.add(metadata['Grantor'])
+        if metadata.get('Grantee'):
+            grantees.add(metadata['Grantee'])
+
+        document_rows.append((
+            countyID,
+            metadata.get('instrumentType', ''),
+            metadata.get('fileStampDate', None),
+            metadata.get('fileDate', None),
+            metadata.get('legalDescription', '')
+        ))
+        parties.append((grantors, grantees))
+
+    # Documents and Parties for the whole INDEX1 file go in one transaction;
+    # documentIDs come from each INSERT's consecutive AUTO_INCREMENT block
+    document_ids = []
+    party_rows = []
     with connection.cursor() as cursor:
-        for metadata in documents:
-            filename = metadata.get('FileName')
-            if not filename:
-                print("Skipping record without FileName")
-                continue
-
-            # Combine grantors/grantees from both indexes for this filename
-            grantors = set()
-            grantees = set()
-
-            # index1_data is list, so no direct lookup; must scan or skip
-            # But since grantors/grantees sets are only in index2_data, we get from there:
-            grantors.update(index2_data['grantors'].get(filename, set()))
-            grantees.update(index2_data['grantees'].get(filename, set()))
-
-            # Also add grantor/grantee from current metadata (index1 line)
-            if metadata.get('Grantor'):
-                grantors.add(metadata['Grantor'])
-            if metadata.get('Grantee'):
-                grantees.add(metadata['Grantee'])
-
-            temp_prserv = str(uuid.uuid4())[:10]
-
-            countyID = COUNTY_ID
-
-
-           # Insert Document row
-            sql_insert_doc = """
-                INSERT INTO Document (PRSERV, countyID, instrumentType, instrumentDate, filingDate, legalDescription)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """
-            cursor.execute(sql_insert_doc, (
-                temp_prserv,
-                countyID,
-                metadata.get('instrumentType', ''),
-                metadata.get('fileStampDate', None),
-                metadata.get('fileDate', None),
-                metadata.get('legalDescription', '')
-            ))
-            connection.commit()
-
-
-            # Get generated documentID
-            cursor.execute("SELECT LAST_INSERT_ID() AS last_id")
-            document_id = cursor.fetchone()['last_id']
-            prserv = base36_encode(document_id)
-
-            # Update Document PRSERV with compressed code
-            cursor.execute("UPDATE Document SET PRSERV = %s WHERE documentID = %s", (prserv, document_id))
-            connection.commit()
-            print(f"Document {filename}: inserted with documentID={document_id}, PRSERV={prserv}")
-
-            # Insert Parties (grantors and grantees)
-            sql_insert_party = """
+        for i in range(0, len(document_rows), DOCUMENT_INSERT_BATCH):
+            batch = document_rows[i:i + DOCUMENT_INSERT_BATCH]
+            first_id = insert_documents(cursor, batch)
+            document_ids.extend(range(first_id, first_id + len(batch)))
+
+        for document_id, (grantors, grantees) in zip(document_ids, parties):
+            party_rows.extend((document_id, name, 'Grantor', countyID) for name in grantors)
+            party_rows.extend((document_id, name, 'Grantee', countyID) for name in grantees)
+        if party_rows:
+            cursor.executemany("""
                 INSERT INTO Party (documentID, name, role, countyID)
                 VALUES (%s, %s, %s, %s)
-            """
-
-            for name in grantors:
-                cursor.execute(sql_insert_party, (document_id, name, 'Grantor', countyID))
-            for name in grantees:
-                cursor.execute(sql_insert_party, (document_id, name, 'Grantee', countyID))
-
-            connection.commit()
-            print(f"Inserted {len(grantors)} grantors and {len(grantees)} grantees for documentID {document_id}")
-
-            # Upload file to S3
-            original_file = os.path.join(folder_path, filename)
-            if not os.path.isfile(original_file):
-                print(f"ERROR: Document file not found: {original_file}")
-                continue
-
-            _, ext = os.path.splitext(original_file)
-            s3_key = f"{BASE_S3_DIR}{prserv}{ext}"
-            upload_to_s3(original_file, bucket_name, s3_key)
+            """, party_rows)
+    connection.commit()
+
+    print(f"Inserted {len(document_rows)} Documents (documentID {document_ids[0]} → {document_ids[-1]}) "
+          f"and {len(party_rows)} Parties")
+
+    # Uploads drain in the background while the next folder is inserted
+    for metadata, document_id in zip(documents, document_ids):
+        filename = metadata['FileName']
+        prserv = base36_encode(document_id)
+        original_file = os.path.join(folder_path, filename)
+        _, ext = os.path.splitext(original_file)
+        s3_key = f"{BASE_S3_DIR}{prserv}{ext}"
+        if not os.path.isfile(original_file):
+            print(f"ERROR: Document file not found: {original_file}")
+            uploader.record(original_file, s3_key, prserv, FileNotFoundError(original_file))
+            continue
+        uploader.submit(original_file, s3_key, prserv)
 
 
 # --- ENTRY POINT ---
 
 def main():
-    connection = pymysql.connect(**DB_CONFIG)
+    uploader = S3UploadPipeline(S3_BUCKET)
     try:
         for foldername in os.listdir(BASE_DIR):
             folder_path = os.path.join(BASE_DIR, foldername)
             if os.path.isdir(folder_path):
                 try:
-                    process_folder(folder_path, connection, S3_BUCKET)
+                    with db_pool.connection() as connection:
+                        process_folder(folder_path, connection, uploader)
                 except Exception as e:
                     print(f"Error processing folder {foldername}: {e}")
+
+        for attempt in range(UPLOAD_RETRY_PASSES):
+            if not uploader.failures():
+                break
+            retried = uploader.retry_failed()
+            print(f"Retry pass {attempt + 1}: re-uploaded {retried} failed files")
     finally:
-        connection.close()
+        uploader.close()
+        db_pool.close()
+
+    failed = uploader.failures()
+    print(f"Uploaded {len(uploader.results) - len(failed)} files, {len(failed)} failed")
+    uploader.write_report(UPLOAD_REPORT)
+    print(f"Per-file upload results written to {UPLOAD_REPORT}")
 
 if __name__ == "__main__":
     main()